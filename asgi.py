@@ -0,0 +1,271 @@
+# ASGI entry point. Routes that fan out to several independent Mongo queries are
+# served by async handlers on Motor and run those queries concurrently; every
+# other route falls through to the Flask app, so paths and JSON shapes match.
+# Query building and response shaping come from main.py; only the I/O differs.
+#
+#   uvicorn asgi:application --workers 4
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.convertors import Convertor, register_url_convertor
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from compression import negotiate_encoding, compress
+from live_feed import LiveFeedFull
+from main import (
+    app as flask_app, warm_up, request_id, metrics, verify_token, projection, serialize_incident,
+    parse_limit, parse_max_km, incidents_page_query, find_incidents_page, split_page,
+    user_names_filter, user_names_map, USER_NAME_FIELDS, user_detail_queries, user_details_response,
+    nearest_hospitals_pipeline, geo_near_results, rank_hospitals, unranked_hospitals,
+    HOSPITAL_LOCATION_FIELDS, UNLOCATED_HOSPITALS,
+    INCIDENT_LOCATION_FIELDS, incident_location, assigned_hospitals_filter, incident_hospitals_response,
+    live_feed, stream_ticket_filter, sse_event, SSE_HEADERS, INCIDENT_SCHEMA, HOSPITAL_SCHEMA
+)
+
+logger = logging.getLogger('swiftaid')
+
+motor_client = None
+db = None
+
+# Only 24-hex ids reach the async handlers; '/dashboard/incidents/export' and
+# malformed ids fall through to Flask
+class ObjectIdConvertor(Convertor):
+    regex = '[0-9a-fA-F]{24}'
+
+    def convert(self, value):
+        return value
+
+    def to_string(self, value):
+        return str(value)
+
+register_url_convertor('objectid', ObjectIdConvertor())
+
+# Mirrors the CORS headers flask_cors adds to the routes served by Flask
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Expose-Headers': 'X-Next-Cursor, X-Next-Page, X-Total-Count, X-Request-ID'
+}
+
+def json_response(data, status_code=200, headers=None):
+    return Response(flask_app.json.dumps(data), status_code=status_code,
+                    headers={**CORS_HEADERS, **(headers or {})}, media_type='application/json')
+
+def error_response(error, status_code):
+    return json_response({'success': False, 'error': error}, status_code)
+
+# Same rules as main.compress_response
+def compress_response(request, response):
+    if response.status_code != 200 or 'content-encoding' in response.headers:
+        return response
+
+    response.headers.append('Vary', 'Accept-Encoding')
+    if len(response.body) < flask_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+    if not encoding:
+        return response
+
+    response.body = compress(response.body, encoding)
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = str(len(response.body))
+    return response
+
+# Async counterpart of token_required plus the Flask request hooks: request id,
+# metrics, error logging and response compression. Token checks can hit Mongo
+# (revocation sync) through the synchronous client, so they run in a thread.
+def token_required(handler):
+    async def decorated(request):
+        request_token = request_id.set(request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex)
+        metrics.start_request(handler.__name__)
+        try:
+            current_user, error = await run_in_threadpool(verify_token, request.headers.get('Authorization'))
+            if error:
+                response = error_response(error, 401)
+            else:
+                try:
+                    response = compress_response(request, await handler(request, current_user))
+                except Exception as e:
+                    logger.exception("Error in %s: %s", handler.__name__, e)
+                    response = error_response(str(e), 500)
+            response.headers['X-Request-ID'] = request_id.get()
+            metrics.finish_request(request.method, response.status_code)
+            return response
+        finally:
+            request_id.reset(request_token)
+    decorated.__name__ = handler.__name__
+    return decorated
+
+async def resolve_user_names(incidents):
+    query = user_names_filter(incidents)
+    if query is None:
+        return {}
+    return user_names_map(await db.users.find(query, USER_NAME_FIELDS).to_list(length=None))
+
+@token_required
+async def get_incidents(request, current_user):
+    try:
+        query, skip, limit = incidents_page_query(request.query_params)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    incidents, next_cursor = split_page(
+        await find_incidents_page(db, query, skip, limit).to_list(length=limit + 1), limit
+    )
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+
+    user_names = await resolve_user_names(incidents)
+    return json_response([serialize_incident(incident, user_names) for incident in incidents], headers=headers)
+
+@token_required
+async def get_incident_details(request, current_user):
+    incident = await db.incidents.find_one(
+        {'_id': ObjectId(request.path_params['incident_id'])}, projection(INCIDENT_SCHEMA)
+    )
+    if not incident:
+        return error_response('Incident not found', 404)
+
+    user_names = await resolve_user_names([incident])
+    return json_response(serialize_incident(incident, user_names))
+
+@token_required
+async def get_user_details(request, current_user):
+    user = await db.users.find_one({'_id': ObjectId(request.path_params['user_id'])})
+    if not user:
+        return error_response('User not found', 404)
+
+    profile, contacts_cursor, incidents_cursor = user_detail_queries(db, user.get('email'))
+    profile, emergency_contacts, user_incidents = await asyncio.gather(
+        profile, contacts_cursor.to_list(length=None), incidents_cursor.to_list(length=None)
+    )
+    return json_response(user_details_response(user, profile, emergency_contacts, user_incidents))
+
+async def nearest_hospitals(lat, lng, limit, max_km=None):
+    pipeline = nearest_hospitals_pipeline(lat, lng, limit, max_km)
+    try:
+        located, unlocated = await asyncio.gather(
+            db.hospital_user.aggregate(pipeline).to_list(length=limit),
+            db.hospital_user.find(UNLOCATED_HOSPITALS, HOSPITAL_LOCATION_FIELDS).to_list(length=None)
+        )
+    except OperationFailure:
+        hospitals = await db.hospital_user.find({}, HOSPITAL_LOCATION_FIELDS).to_list(length=None)
+        return rank_hospitals(hospitals, lat, lng, limit, max_km)
+    return rank_hospitals(unlocated, lat, lng, limit, max_km, ranked=geo_near_results(located))
+
+async def first_hospitals(limit):
+    return unranked_hospitals(await db.hospital_user.find({}, projection(HOSPITAL_SCHEMA)).to_list(length=limit))
+
+async def find_assigned_hospitals(assignments):
+    query = assigned_hospitals_filter(assignments)
+    if query is None:
+        return []
+    return await db.hospital_user.find(query, projection(HOSPITAL_SCHEMA)).to_list(length=None)
+
+async def incident_assignments_with_hospitals(incident_id):
+    assignments = await db.incident_assignments.find({'incident_id': incident_id}).to_list(length=None)
+    return assignments, await find_assigned_hospitals(assignments)
+
+@token_required
+async def get_incident_hospitals(request, current_user):
+    incident_id = request.path_params['incident_id']
+    incident = await db.incidents.find_one({'_id': ObjectId(incident_id)}, INCIDENT_LOCATION_FIELDS)
+    if not incident:
+        return error_response('Incident not found', 404)
+
+    try:
+        limit = parse_limit(request.query_params.get('limit'), default=10)
+        max_km = parse_max_km(request.query_params.get('max_km'))
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    location = incident_location(incident)
+    hospitals, (assignments, assigned_hospitals), ambulances = await asyncio.gather(
+        nearest_hospitals(*location, limit, max_km) if location else first_hospitals(limit),
+        incident_assignments_with_hospitals(incident_id),
+        db.ambulances.find({'current_incident_id': incident_id}).to_list(length=None)
+    )
+    return json_response(incident_hospitals_response(
+        incident, hospitals, assignments, ambulances, assigned_hospitals
+    ))
+
+# Live feed subscriber for the event loop: the feed's watcher thread hands events
+# over with call_soon_threadsafe, and a stalled client drops its oldest event
+class AsyncSubscriber:
+    def __init__(self, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def put_nowait(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+# Async counterpart of main.stream_dashboard: a client costs a queue, not a thread
+async def stream_dashboard(request):
+    metrics.start_request('stream_dashboard')
+    ticket = request.query_params.get('ticket')
+    if not ticket or not await db.stream_tickets.find_one_and_delete(stream_ticket_filter(ticket)):
+        metrics.finish_request(request.method, 401)
+        return error_response('Stream ticket is missing, expired or already used', 401)
+
+    try:
+        subscriber = live_feed.subscribe(AsyncSubscriber(live_feed.queue_size))
+    except LiveFeedFull as e:
+        metrics.finish_request(request.method, 503)
+        return error_response(str(e), 503)
+
+    async def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield sse_event(event)
+        finally:
+            live_feed.unsubscribe(subscriber)
+            metrics.finish_request(request.method, 200)
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={**CORS_HEADERS, **SSE_HEADERS})
+
+@asynccontextmanager
+async def lifespan(app):
+    global motor_client, db
+    motor_client = AsyncIOMotorClient(
+        flask_app.config['MONGO_URI'],
+        tz_aware=False,
+        event_listeners=[metrics],
+        maxPoolSize=flask_app.config['ASYNC_MONGO_MAX_POOL_SIZE'],
+        minPoolSize=flask_app.config['MONGO_MIN_POOL_SIZE'],
+        waitQueueTimeoutMS=flask_app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS']
+    )
+    db = motor_client.get_default_database()
+    await asyncio.gather(db.command('ping'), asyncio.to_thread(warm_up))
+    yield
+    motor_client.close()
+
+application = Starlette(
+    routes=[
+        Route('/dashboard/incidents', get_incidents, methods=['GET']),
+        Route('/dashboard/incidents/{incident_id:objectid}', get_incident_details, methods=['GET']),
+        Route('/admin/users/{user_id:objectid}', get_user_details, methods=['GET']),
+        Route('/admin/incident-hospitals/{incident_id:objectid}', get_incident_hospitals, methods=['GET']),
+        Route('/dashboard/stream', stream_dashboard, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,48 @@
+# Result bookkeeping for bulk assignment creation (main.create_assignments).
+# Items are validated, inserted in one bulk write and reported back per request
+# index; these helpers map validation failures and bulk write errors back to
+# those indexes. They touch neither Flask nor Mongo, so they are tested alone.
+
+# The request's "ordered" flag must be a JSON boolean (the route defaults it to true)
+def parse_ordered(value):
+    if not isinstance(value, bool):
+        raise ValueError('ordered must be a boolean')
+    return value
+
+# In ordered mode nothing after the first failed item is attempted
+def items_to_insert(results, parsed, ordered):
+    if ordered:
+        failed = [index for index, result in enumerate(results) if result]
+        if failed:
+            return {index: item for index, item in parsed.items() if index < failed[0]}
+    return dict(parsed)
+
+# Record the outcome of the bulk insert of documents (sent in the order of
+# indexes) into results. write_errors maps a position in the batch to its error
+# message; in ordered mode the server stops at the first one, so later
+# positions are left unset (reported as skipped). Returns the created results.
+def record_inserts(results, indexes, documents, write_errors, ordered):
+    created = []
+    for position, (index, document) in enumerate(zip(indexes, documents)):
+        if position in write_errors:
+            results[index] = {'index': index, 'status': 'error', 'error': write_errors[position]}
+            continue
+        if ordered and write_errors and position > min(write_errors):
+            continue
+        result = {
+            'index': index,
+            'status': 'created',
+            'assignment_id': str(document['_id']),
+            'incident_id': document['incident_id'],
+            'hospital_name': document['hospital_name'],
+            'ambulance_id': None
+        }
+        results[index] = result
+        created.append((result, document))
+    return created
+
+def fill_skipped(results):
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = {'index': index, 'status': 'skipped'}
+    return results
@@ -0,0 +1,69 @@
+# Concurrent load test comparing the sync (Flask) and async (asgi.py) servers.
+#
+# Start both against the same local mongod with the same number of worker
+# processes; the sync side runs under gunicorn (serve.py), not the debug server:
+#   WEB_WORKERS=4 PORT=5000 python serve.py          # sync, port 5000
+#   uvicorn asgi:application --port 8000 --workers 4 # async
+# then run:
+#   python benchmarks/bench_asgi_load.py http://localhost:5000 http://localhost:8000
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+REQUESTS = int(os.getenv('LOAD_REQUESTS', 2000))
+CONCURRENCY = int(os.getenv('LOAD_CONCURRENCY', 50))
+
+async def login(client):
+    response = await client.post('/admin/login', json={'username': 'admin', 'password': 'admin123'})
+    return response.json()['token']
+
+async def pick_ids(client, headers):
+    incidents = (await client.get('/dashboard/incidents?limit=1', headers=headers)).json()
+    users = (await client.get('/admin/users?limit=1', headers=headers)).json()
+    return incidents[0]['_id'], users[0]['_id']
+
+async def run(base_url):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        headers = {'Authorization': f'Bearer {await login(client)}'}
+        incident_id, user_id = await pick_ids(client, headers)
+        paths = [
+            '/dashboard/incidents?limit=50',
+            f'/dashboard/incidents/{incident_id}',
+            f'/admin/users/{user_id}',
+            f'/admin/incident-hospitals/{incident_id}',
+        ]
+
+        latencies = {path: [] for path in paths}
+        queue = asyncio.Queue()
+        for i in range(REQUESTS):
+            queue.put_nowait(paths[i % len(paths)])
+
+        async def worker():
+            while not queue.empty():
+                path = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                response.raise_for_status()
+                latencies[path].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+        elapsed = time.perf_counter() - start
+        return latencies, REQUESTS / elapsed
+
+def percentile(values, pct):
+    return statistics.quantiles(values, n=100)[pct - 1]
+
+def main():
+    for base_url in sys.argv[1:]:
+        latencies, throughput = asyncio.run(run(base_url))
+        print(f"{base_url}  {throughput:.0f} req/s  ({REQUESTS} requests, concurrency {CONCURRENCY})")
+        for path, values in latencies.items():
+            print(f"  {path[:48]:<50}p50 {percentile(values, 50):8.1f} ms   p99 {percentile(values, 99):8.1f} ms")
+
+if __name__ == '__main__':
+    main()
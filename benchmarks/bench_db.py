@@ -0,0 +1,16 @@
+# Benchmarks that seed data wipe the collections they use, so they only ever
+# run against BENCH_MONGO_URI (never the app's MONGO_URI), and only when that
+# URI names a database ending in _bench.
+import os
+import sys
+
+from pymongo.uri_parser import parse_uri
+
+DEFAULT_BENCH_URI = 'mongodb://localhost:27017/SwiftAid_bench'
+
+def bench_mongo_uri():
+    uri = os.getenv('BENCH_MONGO_URI', DEFAULT_BENCH_URI)
+    database = parse_uri(uri).get('database') or ''
+    if not database.endswith('_bench'):
+        sys.exit(f"Refusing to run: BENCH_MONGO_URI must name a database ending in _bench, got {database!r}")
+    return uri
@@ -0,0 +1,82 @@
+# Dispatch latency under concurrent claims, and a check that no ambulance is
+# ever handed to two incidents.
+#
+# Wipes the ambulances collection, so it runs against a throwaway *_bench
+# database given as BENCH_MONGO_URI (default mongodb://localhost:27017/SwiftAid_bench):
+#   python benchmarks/bench_dispatch.py
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_db import bench_mongo_uri
+from dispatch import claim_nearest_ambulance
+from indexes import ensure_indexes
+
+AMBULANCES = int(os.getenv('DISPATCH_AMBULANCES', 2000))
+DISPATCHES = int(os.getenv('DISPATCH_REQUESTS', 2500))
+CONCURRENCY = int(os.getenv('DISPATCH_CONCURRENCY', 32))
+CENTER = (12.9716, 77.5946)
+
+def seed(db, rng):
+    db.ambulances.delete_many({})
+    db.ambulances.insert_many([
+        {
+            'vehicle_number': f'KA-BENCH-{i:05d}',
+            'status': 'on-duty' if i % 10 else 'off-duty',
+            'hospital_name': f'Bench Hospital {i % 50}',
+            'current_incident_id': None,
+            'geo': {'type': 'Point', 'coordinates': [
+                CENTER[1] + rng.uniform(-0.3, 0.3), CENTER[0] + rng.uniform(-0.3, 0.3)
+            ]}
+        }
+        for i in range(AMBULANCES)
+    ])
+    ensure_indexes(db)
+
+def main():
+    db = MongoClient(bench_mongo_uri(), maxPoolSize=CONCURRENCY).get_default_database()
+    rng = random.Random(0)
+    seed(db, rng)
+    incidents = [
+        (str(ObjectId()), CENTER[0] + rng.uniform(-0.3, 0.3), CENTER[1] + rng.uniform(-0.3, 0.3))
+        for _ in range(DISPATCHES)
+    ]
+
+    def dispatch(incident):
+        incident_id, lat, lng = incident
+        start = time.perf_counter()
+        ambulance = claim_nearest_ambulance(db, incident_id, lat, lng, projection={'_id': 1})
+        return (time.perf_counter() - start) * 1000, ambulance
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        results = list(pool.map(dispatch, incidents))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    claimed = [ambulance['_id'] for _, ambulance in results if ambulance]
+    available = db.ambulances.count_documents({'status': 'on-duty'})
+    quantiles = statistics.quantiles(latencies, n=100)
+
+    print(f"{DISPATCHES} dispatches over {available} on-duty ambulances, concurrency {CONCURRENCY}")
+    print(f"  throughput {DISPATCHES / elapsed:8.0f} dispatches/s")
+    print(f"  p50 {quantiles[49]:8.2f} ms   p95 {quantiles[94]:8.2f} ms   p99 {quantiles[98]:8.2f} ms")
+    print(f"  claimed {len(claimed)}, unfulfilled {DISPATCHES - len(claimed)}")
+
+    double_claims = len(claimed) - len(set(claimed))
+    stored = db.ambulances.count_documents({'current_incident_id': {'$ne': None}})
+    if double_claims or stored != len(claimed):
+        print(f"  FAILED: {double_claims} ambulances claimed twice, {stored} stored claims")
+        sys.exit(1)
+    print("  every ambulance was claimed at most once")
+
+if __name__ == '__main__':
+    main()
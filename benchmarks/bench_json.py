@@ -0,0 +1,60 @@
+# Encode time for 10k incident payloads: stdlib json + custom default vs the orjson provider.
+#
+#   python benchmarks/bench_json.py
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('ENSURE_INDEXES', 'false')
+os.environ.setdefault('STATS_ROLLUPS', 'false')
+os.environ.setdefault('CLEANUP_JOBS', 'false')
+
+from main import app, json_default
+
+INCIDENTS = 10000
+ROUNDS = 5
+
+def make_incidents():
+    now = datetime.utcnow()
+    return [
+        {
+            '_id': ObjectId(),
+            'incident_id': f'INC{i}',
+            'user_email': f'user{i % 500}@example.com',
+            'user_name': f'User {i % 500}',
+            'lat': 12.9716 + i * 1e-5,
+            'lng': 77.5946 - i * 1e-5,
+            'accel_mag': 31.4,
+            'speed': 42,
+            'metadata': {'manual': bool(i % 2), 'sos_type': 'self', 'battery': 87, 'device': 'android'},
+            'timestamp': now - timedelta(seconds=i),
+            'created_at': now - timedelta(seconds=i),
+            'emails_sent': 3
+        } for i in range(INCIDENTS)
+    ]
+
+def main():
+    incidents = make_incidents()
+
+    stdlib = min(timeit.repeat(
+        lambda: json.dumps(incidents, default=json_default, sort_keys=True),
+        number=1, repeat=ROUNDS
+    ))
+    with app.app_context():
+        provider = min(timeit.repeat(
+            lambda: app.json.response(incidents),
+            number=1, repeat=ROUNDS
+        ))
+
+    print(f"{type(app.json).__name__} encoding {INCIDENTS} incidents (best of {ROUNDS})")
+    print(f"  stdlib json:  {stdlib * 1000:8.1f} ms")
+    print(f"  provider:     {provider * 1000:8.1f} ms")
+    print(f"  speedup:      {stdlib / provider:8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# Bytes transferred and decode time per endpoint, full documents vs schema projection.
+#
+# Reads from a *_bench database given as BENCH_MONGO_URI (default
+# mongodb://localhost:27017/SwiftAid_bench); fill it with representative data
+# first (flask --app main seed-data --uri $BENCH_MONGO_URI), then run:
+#   python benchmarks/bench_projection.py
+import os
+import sys
+import time
+
+import bson
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_db import bench_mongo_uri
+
+# The app reads MONGO_URI at import; point it at the bench database whatever the environment says
+os.environ['MONGO_URI'] = bench_mongo_uri()
+os.environ.setdefault('ENSURE_INDEXES', 'false')
+os.environ.setdefault('STATS_ROLLUPS', 'false')
+os.environ.setdefault('CLEANUP_JOBS', 'false')
+
+from main import (
+    mongo, projection, EXPORT_PROJECTION, INCIDENT_SCHEMA, INCIDENT_SUMMARY_SCHEMA,
+    AMBULANCE_SCHEMA, HOSPITAL_SCHEMA, POLICE_OFFICER_SCHEMA
+)
+
+SAMPLE = 1000
+
+ENDPOINTS = [
+    ('/dashboard/incidents', 'incidents', projection(INCIDENT_SCHEMA)),
+    ('/dashboard/incidents/export', 'incidents', EXPORT_PROJECTION),
+    ('/admin/ambulance-assignments (incident)', 'incidents', projection(INCIDENT_SUMMARY_SCHEMA)),
+    ('/admin/ambulance-assignments', 'ambulances', projection(AMBULANCE_SCHEMA)),
+    ('/admin/hospitals', 'hospital_user', projection(HOSPITAL_SCHEMA)),
+    ('/admin/police-stations', 'POLICE_users', projection(POLICE_OFFICER_SCHEMA)),
+]
+
+# Raw BSON bytes and decode time for SAMPLE documents read with the given projection
+def measure(collection, fields):
+    raw_collection = mongo.db.get_collection(
+        collection, codec_options=bson.CodecOptions(document_class=bson.RawBSONDocument)
+    )
+    raw_docs = list(raw_collection.find({}, fields).limit(SAMPLE))
+    size = sum(len(doc.raw) for doc in raw_docs)
+
+    start = time.perf_counter()
+    for doc in raw_docs:
+        bson.decode(doc.raw)
+    decode_ms = (time.perf_counter() - start) * 1000
+    return size, decode_ms
+
+def main():
+    print(f"{'endpoint':<42}{'full KB':>10}{'proj KB':>10}{'saved':>8}{'full ms':>10}{'proj ms':>10}")
+    for endpoint, collection, fields in ENDPOINTS:
+        full_size, full_ms = measure(collection, None)
+        proj_size, proj_ms = measure(collection, fields)
+        saved = 1 - proj_size / full_size if full_size else 0
+        print(f"{endpoint:<42}{full_size / 1024:>10.1f}{proj_size / 1024:>10.1f}{saved:>8.0%}"
+              f"{full_ms:>10.2f}{proj_ms:>10.2f}")
+
+if __name__ == '__main__':
+    main()
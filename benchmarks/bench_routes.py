@@ -0,0 +1,119 @@
+# Baseline for every read route in main.py: throughput, p50/p95/p99 latency
+# and Mongo commands per request, measured in-process through the Flask test
+# client and the metrics CommandListener.
+#
+# Seed a throwaway database first, then run:
+#   export MONGO_URI=mongodb://localhost:27017/SwiftAid_bench
+#   flask --app main seed-data --uri $MONGO_URI --scale 100000 --drop
+#   python benchmarks/bench_routes.py [baseline.json]
+#
+# BENCH_REQUESTS (per route) and BENCH_CONCURRENCY tune the run. Routes that
+# modify data (POST/DELETE), the endless SSE stream and the debug route are
+# skipped.
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/SwiftAid_bench')
+os.environ.setdefault('ENSURE_INDEXES', 'false')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from main import app, mongo, metrics
+
+REQUESTS = int(os.getenv('BENCH_REQUESTS', 200))
+CONCURRENCY = int(os.getenv('BENCH_CONCURRENCY', 8))
+SKIPPED_ENDPOINTS = {'static', 'serve_static', 'stream_dashboard', 'get_metrics', 'debug_hospitals'}
+
+# URL arguments, filled from the newest document of each collection
+SAMPLE_COLLECTIONS = {
+    'incident_id': 'incidents',
+    'user_id': 'users',
+    'hospital_id': 'hospital_user',
+    'ambulance_id': 'ambulances',
+    'officer_id': 'POLICE_users'
+}
+
+def sample_arguments():
+    arguments = {}
+    for argument, collection in SAMPLE_COLLECTIONS.items():
+        document = mongo.db[collection].find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        if document:
+            arguments[argument] = str(document['_id'])
+    return arguments
+
+def read_routes(arguments):
+    routes = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint in SKIPPED_ENDPOINTS or 'GET' not in rule.methods:
+            continue
+        if not set(rule.arguments) <= set(arguments):
+            print(f"skipping {rule.rule}: no sample document for {', '.join(rule.arguments)}")
+            continue
+        path = rule.rule
+        for argument in rule.arguments:
+            path = path.replace(f'<{argument}>', arguments[argument])
+        routes.append((rule.endpoint, path))
+    return routes
+
+def login():
+    response = app.test_client().post('/admin/login', json={'username': 'admin', 'password': 'admin123'})
+    return response.get_json()['token']
+
+def percentile(values, pct):
+    return statistics.quantiles(values, n=100)[pct - 1] if len(values) > 1 else values[0]
+
+def endpoint_commands(endpoint):
+    stats = metrics.endpoints.get(endpoint)
+    return stats.commands if stats else 0
+
+def run_route(endpoint, path, headers):
+    def call(_):
+        start = time.perf_counter()
+        response = app.test_client().get(path, headers=headers)
+        response.get_data()
+        response.close()
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    call(None)  # warm caches and connections before measuring
+    commands_before = endpoint_commands(endpoint)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        results = list(pool.map(call, range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    return {
+        'path': path,
+        'status': sorted({status for _, status in results}),
+        'throughput': REQUESTS / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'commands_per_request': (endpoint_commands(endpoint) - commands_before) / REQUESTS
+    }
+
+def main():
+    headers = {'Authorization': f'Bearer {login()}', 'Accept-Encoding': 'gzip'}
+    routes = read_routes(sample_arguments())
+    print(f"{REQUESTS} requests per route, concurrency {CONCURRENCY}, database {mongo.db.name}")
+    print(f"{'route':<48}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'cmds':>7}  status")
+
+    results = {}
+    for endpoint, path in routes:
+        result = run_route(endpoint, path, headers)
+        results[endpoint] = result
+        print(f"{path[:47]:<48}{result['throughput']:>9.0f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+              f"{result['p99_ms']:>9.1f}{result['commands_per_request']:>7.1f}  {result['status']}")
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'w') as f:
+            json.dump({'requests': REQUESTS, 'concurrency': CONCURRENCY, 'routes': results}, f, indent=2)
+        print(f"Baseline written to {sys.argv[1]}")
+
+if __name__ == '__main__':
+    main()
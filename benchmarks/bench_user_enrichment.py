@@ -0,0 +1,87 @@
+# Round trips per request for incident user-name enrichment.
+#
+# Wipes users and incidents, so it runs against a throwaway *_bench database
+# given as BENCH_MONGO_URI (default mongodb://localhost:27017/SwiftAid_bench):
+#   python benchmarks/bench_user_enrichment.py
+import os
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_db import bench_mongo_uri
+
+# The app reads MONGO_URI at import; point it at the bench database whatever the environment says
+os.environ['MONGO_URI'] = bench_mongo_uri()
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+counter = CommandCounter()
+monitoring.register(counter)
+
+import jwt
+from main import app, mongo
+
+USERS = 200
+INCIDENTS = 1000
+
+def seed():
+    mongo.db.users.delete_many({})
+    mongo.db.incidents.delete_many({})
+    mongo.db.users.insert_many([
+        {'email': f'user{i}@example.com', 'name': f'User {i}'} for i in range(USERS)
+    ])
+    now = datetime.utcnow()
+    mongo.db.incidents.insert_many([
+        {
+            'incident_id': f'INC{i}',
+            'user_email': f'user{i % USERS}@example.com',
+            'lat': 12.97, 'lng': 77.59,
+            'metadata': {'manual': bool(i % 2), 'sos_type': 'self'},
+            'timestamp': now - timedelta(minutes=i)
+        } for i in range(INCIDENTS)
+    ])
+
+# Replays the pre-batching access pattern: one users.find_one per incident
+def legacy_round_trips(limit):
+    incidents = list(mongo.db.incidents.find().sort('timestamp', -1).limit(limit))
+    for incident in incidents:
+        mongo.db.users.find_one({'email': incident.get('user_email')})
+
+def measure(fn):
+    counter.count = 0
+    fn()
+    return counter.count
+
+def main():
+    seed()
+    token = jwt.encode({'username': 'admin', 'exp': datetime.utcnow() + timedelta(hours=1)},
+                       app.config['SECRET_KEY'], algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+
+    print(f"{'request':<40}{'before':>10}{'after':>10}")
+    for limit in (10, 50, 200):
+        before = measure(lambda: legacy_round_trips(limit))
+        after = measure(lambda: client.get(f'/dashboard/incidents?limit={limit}', headers=headers))
+        print(f"{'/dashboard/incidents?limit=' + str(limit):<40}{before:>10}{after:>10}")
+
+    before = measure(lambda: legacy_round_trips(INCIDENTS))
+    after = measure(lambda: client.get('/dashboard/incidents/export', headers=headers))
+    print(f"{'/dashboard/incidents/export':<40}{before:>10}{after:>10}")
+
+if __name__ == '__main__':
+    main()
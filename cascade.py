@@ -0,0 +1,150 @@
+# Background cascade deletes. Deleting a user removes the users document right
+# away and queues a job in cleanup_jobs that removes their profiles, contacts
+# and incidents in batches, recording progress as it goes:
+#   {_id, kind: 'user_cascade', emails: [...], status: queued|running|done|failed,
+#    progress: {profiles, contacts, incidents}, attempts, not_before, created_at,
+#    started_at, finished_at, lease_until, error}
+# Every process runs a worker; jobs are claimed atomically under a lease that a
+# heartbeat renews while the job runs, so a job abandoned by a crashed worker is
+# picked up again once its lease expires. A failed attempt is requeued with
+# exponential backoff, and the job is only marked failed after max_attempts.
+# All deletes are idempotent, so resuming a half-finished job is safe.
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+JOBS = 'cleanup_jobs'
+
+class CascadeDeleter:
+    def __init__(self, db, batch_size=1000, interval=2.0, lease_seconds=60, max_attempts=5,
+                 retry_delay=5.0, delete_incidents=None, on_complete=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.delete_incidents = delete_incidents or self.db.incidents.delete_many
+        self.on_complete = on_complete
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def jobs(self):
+        return self.db[JOBS]
+
+    def enqueue_user_cleanup(self, emails):
+        job = {
+            'kind': 'user_cascade',
+            'emails': sorted(set(emails)),
+            'status': 'queued',
+            'progress': {'profiles': 0, 'contacts': 0, 'incidents': 0},
+            'attempts': 0,
+            'created_at': datetime.utcnow()
+        }
+        self.jobs.insert_one(job)
+        self._wake.set()
+        return job['_id']
+
+    def job(self, job_id):
+        return self.jobs.find_one({'_id': job_id}, {'emails': 0, 'lease_until': 0})
+
+    def claim(self):
+        now = datetime.utcnow()
+        return self.jobs.find_one_and_update(
+            {'$or': [
+                {'status': 'queued', 'not_before': {'$not': {'$gt': now}}},
+                {'status': 'running', 'lease_until': {'$lt': now}}
+            ]},
+            {'$set': {'status': 'running', 'lease_until': now + self.lease},
+             '$inc': {'attempts': 1},
+             '$min': {'started_at': now}},
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _advance(self, job, field, count):
+        self.jobs.update_one({'_id': job['_id']}, {'$inc': {f'progress.{field}': count}})
+
+    # Keep the lease alive while a single slow delete is in flight
+    def _heartbeat(self, job, stop):
+        while not stop.wait(self.lease.total_seconds() / 3):
+            try:
+                self.jobs.update_one(
+                    {'_id': job['_id'], 'status': 'running'},
+                    {'$set': {'lease_until': datetime.utcnow() + self.lease}}
+                )
+            except Exception as e:
+                logger.warning("Could not renew lease of cleanup job %s: %s", job['_id'], e)
+
+    def _retry_or_fail(self, job, error):
+        attempts = job.get('attempts', 1)
+        if attempts >= self.max_attempts:
+            logger.error("Cleanup job %s failed after %d attempts: %s", job['_id'], attempts, error)
+            update = {'$set': {'status': 'failed', 'error': str(error), 'finished_at': datetime.utcnow()}}
+        else:
+            delay = self.retry_delay * 2 ** (attempts - 1)
+            logger.warning("Cleanup job %s attempt %d failed, retrying in %.0fs: %s",
+                           job['_id'], attempts, delay, error)
+            update = {'$set': {'status': 'queued', 'error': str(error),
+                               'not_before': datetime.utcnow() + timedelta(seconds=delay)}}
+        update['$unset'] = {'lease_until': ''}
+        self.jobs.update_one({'_id': job['_id']}, update)
+
+    def run_job(self, job):
+        # A job whose worker kept dying mid-run comes back through an expired lease
+        if job.get('attempts', 1) > self.max_attempts:
+            self._retry_or_fail(job, RuntimeError('lease expired on the final attempt'))
+            return
+
+        emails = job['emails']
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job, stop), name='cascade-lease', daemon=True).start()
+        try:
+            self._advance(job, 'profiles', self.db.profiles.delete_many({'user_email': {'$in': emails}}).deleted_count)
+            self._advance(job, 'contacts', self.db.contacts.delete_many({'user_email': {'$in': emails}}).deleted_count)
+
+            while True:
+                ids = [
+                    incident['_id'] for incident in
+                    self.db.incidents.find({'user_email': {'$in': emails}}, {'_id': 1}).limit(self.batch_size)
+                ]
+                if not ids:
+                    break
+                self._advance(job, 'incidents', self.delete_incidents({'_id': {'$in': ids}}).deleted_count)
+
+            self.jobs.update_one(
+                {'_id': job['_id']},
+                {'$set': {'status': 'done', 'finished_at': datetime.utcnow()},
+                 '$unset': {'lease_until': '', 'error': '', 'not_before': ''}}
+            )
+        except Exception as e:
+            self._retry_or_fail(job, e)
+            return
+        finally:
+            stop.set()
+
+        if self.on_complete:
+            self.on_complete(job)
+
+    # Background worker
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='cascade-deletes', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                job = self.claim()
+                while job:
+                    self.run_job(job)
+                    job = self.claim()
+            except Exception as e:
+                logger.exception("Cleanup worker failed: %s", e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,97 @@
+# Content negotiation and compression for JSON responses, plus the static
+# dashboard assets: loaded once at startup, minified, fingerprinted with a
+# content hash and precompressed for every supported encoding.
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/html', 'text/css', 'text/csv',
+    'text/plain', 'application/javascript'
+}
+
+def negotiate_encoding(accept_encoding, available=ENCODINGS):
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    for encoding in available:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+# Dynamic responses favour speed; static assets are compressed once at maximum level
+def compress(data, encoding, static=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if static else 4)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9 if static else 6)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+# Strings, comments and whitespace runs; quoted strings are always kept verbatim
+CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)|(\s+)', re.S)
+
+def minify_css(text):
+    text = CSS_TOKENS.sub(lambda m: m.group(1) or ('' if m.group(2) else m.group(0)), text)
+
+    def collapse(m):
+        if m.group(1):
+            return m.group(1)
+        before = m.string[m.start() - 1] if m.start() else ''
+        after = m.string[m.end()] if m.end() < len(m.string) else ''
+        if before in '{};,:>' or after in '{};,>':
+            return ''
+        return ' '
+
+    return CSS_TOKENS.sub(collapse, text).strip()
+
+class StaticAsset:
+    def __init__(self, name, body, mimetype):
+        self.name = name
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.encoded = {encoding: compress(body, encoding, static=True) for encoding in ENCODINGS}
+
+class StaticAssets:
+    # names are processed in order, so stylesheets should precede the HTML that links them
+    def __init__(self, root, names):
+        self.assets = {}
+        for name in names:
+            with open(os.path.join(root, name), 'rb') as f:
+                body = f.read()
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+            if mimetype == 'text/css':
+                body = minify_css(body.decode('utf-8')).encode('utf-8')
+            elif mimetype == 'text/html':
+                body = self._fingerprint_links(body.decode('utf-8')).encode('utf-8')
+
+            self.assets[name] = StaticAsset(name, body, mimetype)
+
+    # Point links at content-hashed URLs so those assets can be cached indefinitely
+    def _fingerprint_links(self, html):
+        for name, asset in self.assets.items():
+            html = html.replace(f'href="{name}"', f'href="{name}?v={asset.etag}"')
+            html = html.replace(f'src="{name}"', f'src="{name}?v={asset.etag}"')
+        return html
+
+    def get(self, name):
+        return self.assets.get(name)
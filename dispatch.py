@@ -0,0 +1,77 @@
+# Ambulance dispatch. An ambulance is available when it is on duty and has no
+# current_incident_id; claiming one is a single find_one_and_update whose filter
+# includes that condition, so two concurrent dispatches can never take the same
+# ambulance. current_incident_id / assignment_time is the only assignment state.
+#
+# Ambulances carry a GeoJSON `geo` point (their position, or their hospital's
+# until live positions are reported), indexed 2dsphere together with status.
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+AVAILABLE = {'status': 'on-duty', 'current_incident_id': None}
+
+def claim_ambulance(db, incident_id, near=None, max_km=None, hospital_name=None, projection=None):
+    query = dict(AVAILABLE)
+    if hospital_name is not None:
+        query['hospital_name'] = hospital_name
+    if near is not None:
+        lat, lng = near
+        query['geo'] = {'$nearSphere': {'$geometry': {'type': 'Point', 'coordinates': [lng, lat]}}}
+        if max_km is not None:
+            query['geo']['$nearSphere']['$maxDistance'] = max_km * 1000
+
+    return db.ambulances.find_one_and_update(
+        query,
+        {'$set': {'current_incident_id': str(incident_id), 'assignment_time': datetime.utcnow()}},
+        projection=projection,
+        return_document=ReturnDocument.AFTER
+    )
+
+# Nearest available ambulance by position. Where ambulances cannot be searched by
+# position (no geo index yet), walks hospitals nearest-first instead; each step is
+# still a single atomic claim.
+def claim_nearest_ambulance(db, incident_id, lat, lng, max_km=None, nearest_hospital_names=None, projection=None):
+    try:
+        ambulance = claim_ambulance(db, incident_id, near=(lat, lng), max_km=max_km, projection=projection)
+        if ambulance or nearest_hospital_names is None:
+            return ambulance
+    except OperationFailure:
+        if nearest_hospital_names is None:
+            raise
+
+    for hospital_name in nearest_hospital_names():
+        ambulance = claim_ambulance(db, incident_id, hospital_name=hospital_name, projection=projection)
+        if ambulance:
+            return ambulance
+    return None
+
+# Free an ambulance; returns the released document, or None when it was not assigned
+def release_ambulance(db, ambulance_id, incident_id=None):
+    query = {'_id': ambulance_id, 'current_incident_id': {'$ne': None}}
+    if incident_id is not None:
+        query['current_incident_id'] = str(incident_id)
+    return db.ambulances.find_one_and_update(
+        query,
+        {'$set': {'current_incident_id': None, 'assignment_time': None}}
+    )
+
+# One-off migration: fold the legacy assigned_incident_id field into
+# current_incident_id and give ambulances without a position their hospital's
+def migrate_ambulances(db):
+    moved = db.ambulances.update_many(
+        {'assigned_incident_id': {'$exists': True}},
+        [
+            {'$set': {'current_incident_id': {'$ifNull': ['$current_incident_id', '$assigned_incident_id']}}},
+            {'$unset': 'assigned_incident_id'}
+        ]
+    ).modified_count
+
+    located = 0
+    for hospital in db.hospital_user.find({'geo': {'$exists': True}}, {'hospital_name': 1, 'geo': 1}):
+        located += db.ambulances.update_many(
+            {'hospital_name': hospital['hospital_name'], 'geo': {'$exists': False}},
+            {'$set': {'geo': hospital['geo']}}
+        ).modified_count
+    return moved, located
@@ -0,0 +1,98 @@
+# Index declarations for every filter/sort pattern used in main.py, plus
+# an explain()-based check that reports queries still doing a COLLSCAN.
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE
+
+# (collection, keys, options)
+INDEXES = [
+    ('incidents', [('timestamp', DESCENDING), ('_id', DESCENDING)], {}),
+    ('incidents', [('user_email', ASCENDING), ('timestamp', DESCENDING)], {}),
+    ('incidents', [('metadata.manual', ASCENDING), ('metadata.sos_type', ASCENDING)], {}),
+    ('incidents', [('incident_id', ASCENDING)], {}),
+    ('users', [('email', ASCENDING)], {}),
+    ('profiles', [('user_email', ASCENDING)], {}),
+    ('contacts', [('user_email', ASCENDING)], {}),
+    ('incident_assignments', [('incident_id', ASCENDING)], {}),
+    ('incident_assignments', [('status', ASCENDING)], {}),
+    ('ambulances', [('current_incident_id', ASCENDING)], {}),
+    ('ambulances', [('geo', GEOSPHERE), ('status', ASCENDING)], {}),
+    ('ambulances', [('hospital_name', ASCENDING), ('status', ASCENDING)], {}),
+    ('hospital_user', [('hospital_name', ASCENDING)], {}),
+    ('hospital_user', [('geo', GEOSPHERE)], {}),
+    ('cleanup_jobs', [('status', ASCENDING), ('created_at', ASCENDING)], {}),
+    ('revoked_tokens', [('expires_at', ASCENDING)], {'expireAfterSeconds': 0}),
+    ('stream_tickets', [('expires_at', ASCENDING)], {'expireAfterSeconds': 0}),
+    ('metrics_snapshots', [('updated_at', ASCENDING)], {'expireAfterSeconds': 3600}),
+]
+
+# Representative queries issued by the handlers (including the foreign side of
+# each $lookup), checked by diagnose_queries: (collection, filter, sort)
+QUERY_PATTERNS = [
+    ('incidents', {}, [('timestamp', -1), ('_id', -1)]),
+    ('incidents', {'user_email': 'probe@example.com'}, [('timestamp', -1)]),
+    ('incidents', {'metadata.manual': True, 'metadata.sos_type': 'self'}, None),
+    ('incidents', {'metadata.manual': False}, None),
+    ('incidents', {'incident_id': 'probe'}, None),
+    ('users', {'email': {'$in': ['probe@example.com']}}, None),
+    ('profiles', {'user_email': 'probe@example.com'}, None),
+    ('contacts', {'user_email': 'probe@example.com'}, None),
+    ('incident_assignments', {'incident_id': 'probe'}, None),
+    ('incident_assignments', {'status': 'accepted'}, None),
+    ('ambulances', {'current_incident_id': {'$exists': True, '$ne': None}}, None),
+    ('ambulances', {'current_incident_id': 'probe'}, None),
+    ('ambulances', {'hospital_name': 'probe', 'status': 'on-duty', 'current_incident_id': None}, None),
+    ('ambulances', {'hospital_name': 'probe', 'status': 'on-duty'}, None),
+    ('hospital_user', {'hospital_name': 'probe'}, None),
+    ('cleanup_jobs', {'status': 'queued'}, [('created_at', 1)]),
+]
+
+def _key_signature(keys):
+    return tuple((field, direction) for field, direction in keys)
+
+# Create any declared index that does not exist yet; returns the names created
+def ensure_indexes(db):
+    created = []
+    existing_by_collection = {}
+
+    for collection_name, keys, options in INDEXES:
+        if collection_name not in existing_by_collection:
+            existing_by_collection[collection_name] = {
+                _key_signature(info['key'])
+                for info in db[collection_name].index_information().values()
+            }
+        existing = existing_by_collection[collection_name]
+
+        signature = _key_signature(keys)
+        if signature in existing:
+            continue
+
+        # background is ignored by MongoDB 4.2+, where builds no longer block the collection
+        name = db[collection_name].create_index(keys, background=True, **options)
+        existing.add(signature)
+        created.append(f'{collection_name}.{name}')
+
+    return created
+
+def _has_collscan(plan):
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(value) for value in plan)
+    return False
+
+# Run explain() on every query pattern and return the ones whose winning plan scans the collection
+def diagnose_queries(db):
+    report = []
+    for collection_name, query, sort in QUERY_PATTERNS:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        report.append({
+            'collection': collection_name,
+            'filter': query,
+            'sort': sort,
+            'collscan': _has_collscan(winning_plan)
+        })
+    return report
@@ -0,0 +1,120 @@
+# One background watcher per process, started by the first subscriber, that
+# tails inserts/updates/deletes on a set of collections and fans each change
+# out to every subscribed dashboard. Subscribers are anything with put_nowait:
+# a queue.Queue for the Flask stream, or an asyncio bridge in asgi.py. Their
+# number is capped per process.
+# Uses a change stream when the deployment supports it (replica set / Atlas)
+# and falls back to polling new documents by _id on standalone servers.
+import logging
+import queue
+import threading
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+class LiveFeedFull(Exception):
+    pass
+
+class LiveFeed:
+    def __init__(self, db, collections, serializers=None, poll_interval=2.0, queue_size=1000,
+                 max_subscribers=200):
+        self.db = db
+        self.collections = list(collections)
+        self.serializers = serializers or {}
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, subscriber=None):
+        if subscriber is None:
+            subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise LiveFeedFull(f'Live feed is at its limit of {self.max_subscribers} subscribers')
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, collection, operation, document_id, document=None):
+        event = {'collection': collection, 'operation': operation, '_id': str(document_id)}
+        if document is not None:
+            serializer = self.serializers.get(collection)
+            event['document'] = serializer(document) if serializer else document
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A stalled client drops its oldest pending event rather than blocking the watcher
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _run(self):
+        try:
+            self._watch_change_stream()
+        except OperationFailure as e:
+            logger.warning("Change streams unavailable (%s); polling for new documents instead", e)
+            self._poll()
+
+    def _watch_change_stream(self):
+        pipeline = [{
+            '$match': {
+                'ns.coll': {'$in': self.collections},
+                'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}
+            }
+        }]
+        resume_token = None
+        while True:
+            try:
+                with self.db.watch(pipeline, full_document='updateLookup',
+                                   resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    while stream.alive:
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        self.publish(
+                            change['ns']['coll'],
+                            change['operationType'],
+                            change['documentKey']['_id'],
+                            change.get('fullDocument')
+                        )
+            except OperationFailure:
+                raise
+            except PyMongoError as e:
+                logger.warning("Live feed change stream interrupted: %s", e)
+                time.sleep(self.poll_interval)
+
+    # Standalone fallback: only inserts are visible, tracked by a per-collection _id high-water mark
+    def _poll(self):
+        high_water = {}
+        for collection in self.collections:
+            latest = self.db[collection].find_one({}, {'_id': 1}, sort=[('_id', -1)])
+            high_water[collection] = latest['_id'] if latest else None
+
+        while True:
+            for collection in self.collections:
+                query = {'_id': {'$gt': high_water[collection]}} if high_water[collection] else {}
+                try:
+                    for document in self.db[collection].find(query).sort('_id', 1):
+                        high_water[collection] = document['_id']
+                        self.publish(collection, 'insert', document['_id'], document)
+                except PyMongoError as e:
+                    logger.warning("Live feed poll failed: %s", e)
+            time.sleep(self.poll_interval)
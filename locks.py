@@ -0,0 +1,76 @@
+# Cross-process mutual exclusion on a document in the locks collection:
+#   {_id: <lock name>, owner: <token of the holder>, lease_until}
+# Acquiring is a single upsert that only matches an expired lease, so exactly
+# one holder wins. While held, a heartbeat thread keeps extending the lease;
+# if the holder dies the heartbeat stops and the lease lapses on its own.
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+LOCKS = 'locks'
+
+class LockTimeout(Exception):
+    pass
+
+class MongoLock:
+    def __init__(self, db, name, lease_seconds=30):
+        self.db = db
+        self.name = name
+        self.lease = timedelta(seconds=lease_seconds)
+
+    @property
+    def collection(self):
+        return self.db[LOCKS]
+
+    def _try_acquire(self, token):
+        now = datetime.utcnow()
+        try:
+            # Matches a missing or lapsed lock; a live one makes the upsert collide on _id
+            self.collection.update_one(
+                {'_id': self.name, 'lease_until': {'$lt': now}},
+                {'$set': {'owner': token, 'lease_until': now + self.lease}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def _heartbeat(self, token, stop):
+        while not stop.wait(self.lease.total_seconds() / 3):
+            try:
+                self.collection.update_one(
+                    {'_id': self.name, 'owner': token},
+                    {'$set': {'lease_until': datetime.utcnow() + self.lease}}
+                )
+            except Exception as e:
+                logger.warning("Could not renew lock %s: %s", self.name, e)
+
+    # Hold the lock for the duration of the block. timeout=0 tries once,
+    # None waits indefinitely; raises LockTimeout when it cannot be acquired.
+    @contextmanager
+    def hold(self, timeout=None):
+        token = uuid.uuid4().hex
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.05
+        while not self._try_acquire(token):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeout(f'Lock {self.name} is held by another process')
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(token, stop),
+                                     name=f'lock-{self.name}', daemon=True)
+        heartbeat.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            self.collection.delete_one({'_id': self.name, 'owner': token})
@@ -1,71 +1,758 @@
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
+from flask.json.provider import JSONProvider, DefaultJSONProvider
 from flask_cors import CORS
 from flask_pymongo import PyMongo
+from pymongo import InsertOne, MongoClient, UpdateOne
+from pymongo.uri_parser import parse_uri
+from pymongo.errors import BulkWriteError, OperationFailure
 from bson import ObjectId
+import click
 import jwt
 import datetime
+import logging
 from functools import wraps
+import base64
+import csv
+import hashlib
+import heapq
+import hmac
 import json
+import math
 import os
+import queue
+import secrets
+import socket
+import threading
+import time
+import uuid
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from indexes import ensure_indexes, diagnose_queries
+from live_feed import LiveFeed, LiveFeedFull
+from rollups import StatsRollups
+from seed import seed, COLLECTIONS as SEED_COLLECTIONS
+from cascade import CascadeDeleter
+from assignments import parse_ordered, items_to_insert, record_inserts, fill_skipped
+from dispatch import AVAILABLE as AVAILABLE_AMBULANCE, claim_nearest_ambulance, release_ambulance, migrate_ambulances
+from log_config import configure_logging, request_id
+from metrics import Metrics
+from compression import StaticAssets, negotiate_encoding, compress, COMPRESSIBLE_MIMETYPES
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from io import StringIO
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
+app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')
+
+configure_logging(app.config['LOG_LEVEL'])
+logger = logging.getLogger('swiftaid')
+
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'supersecret')
 app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/SwiftAid')
+app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+app.config['STATS_CACHE_TTL'] = float(os.getenv('STATS_CACHE_TTL', 15))
+app.config['ENSURE_INDEXES'] = os.getenv('ENSURE_INDEXES', 'true').lower() == 'true'
+app.config['LIVE_FEED_POLL_INTERVAL'] = float(os.getenv('LIVE_FEED_POLL_INTERVAL', 2))
+# Live feed subscribers per process; streams served by Flask each hold a worker
+# thread for their whole life, so they get a much smaller allowance of their own
+app.config['LIVE_FEED_MAX_SUBSCRIBERS'] = int(os.getenv('LIVE_FEED_MAX_SUBSCRIBERS', 200))
+app.config['LIVE_FEED_THREAD_STREAMS'] = int(os.getenv('LIVE_FEED_THREAD_STREAMS', 1))
+app.config['STATS_ROLLUPS'] = os.getenv('STATS_ROLLUPS', 'true').lower() == 'true'
+app.config['STATS_ROLLUP_INTERVAL'] = float(os.getenv('STATS_ROLLUP_INTERVAL', 5))
+
+# Connection pool, per process. A thread uses at most one connection at a time,
+# so the pool only needs the request threads (WEB_THREADS under serve.py) plus
+# the background threads that query Mongo: index bootstrap, rollup maintainer
+# and lock heartbeat, live feed, cleanup worker and lease heartbeat, metrics
+# publisher. Connections per deployment are about
+#   WEB_WORKERS * (MONGO_MAX_POOL_SIZE + 2 monitoring connections per server)
+# plus, under asgi.py, ASYNC_MONGO_MAX_POOL_SIZE per process for Motor.
+BACKGROUND_MONGO_THREADS = 7
+app.config['MONGO_MAX_POOL_SIZE'] = int(os.getenv(
+    'MONGO_MAX_POOL_SIZE', int(os.getenv('WEB_THREADS', 4)) + BACKGROUND_MONGO_THREADS
+))
+app.config['MONGO_MIN_POOL_SIZE'] = int(os.getenv('MONGO_MIN_POOL_SIZE', 2))
+# Motor's pool in asgi.py serves the concurrent queries of every in-flight async request
+app.config['ASYNC_MONGO_MAX_POOL_SIZE'] = int(os.getenv('ASYNC_MONGO_MAX_POOL_SIZE', 50))
+app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+
+# Responses smaller than this are sent uncompressed
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+
+# Requests issuing more Mongo commands than this are logged as likely N+1 patterns
+app.config['MONGO_COMMAND_BUDGET'] = int(os.getenv('MONGO_COMMAND_BUDGET', 20))
+
+# /metrics is served only to scrapers presenting this bearer token; every
+# process publishes its counters this often so one scrape covers all workers
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+app.config['METRICS_PUBLISH_INTERVAL'] = float(os.getenv('METRICS_PUBLISH_INTERVAL', 10))
+
+# Verified JWTs kept per process, and how often revocations are re-read from Mongo
+app.config['TOKEN_CACHE_SIZE'] = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+app.config['TOKEN_REVOCATION_SYNC'] = float(os.getenv('TOKEN_REVOCATION_SYNC', 5))
+
+# Background cascade deletes (see cascade.py)
+app.config['CLEANUP_JOBS'] = os.getenv('CLEANUP_JOBS', 'true').lower() == 'true'
+app.config['CLEANUP_BATCH_SIZE'] = int(os.getenv('CLEANUP_BATCH_SIZE', 1000))
+app.config['CLEANUP_POLL_INTERVAL'] = float(os.getenv('CLEANUP_POLL_INTERVAL', 2))
+app.config['CLEANUP_MAX_ATTEMPTS'] = int(os.getenv('CLEANUP_MAX_ATTEMPTS', 5))
+app.config['CLEANUP_RETRY_DELAY'] = float(os.getenv('CLEANUP_RETRY_DELAY', 5))
+app.config['BULK_DELETE_LIMIT'] = int(os.getenv('BULK_DELETE_LIMIT', 5000))
+
+# Lifetime of the single-use tickets that authenticate the live feed stream
+app.config['STREAM_TICKET_TTL'] = float(os.getenv('STREAM_TICKET_TTL', 30))
+
+# Longest a conditional GET can answer 304 while another service's in-place
+# update goes unnoticed (see collection_validator)
+app.config['CONDITIONAL_GET_MAX_STALENESS'] = float(os.getenv('CONDITIONAL_GET_MAX_STALENESS', 30))
+
+# Longest window /dashboard/analytics/trends covers, in days
+app.config['MAX_TREND_DAYS'] = int(os.getenv('MAX_TREND_DAYS', 366))
+
+# Largest page a list endpoint returns
+app.config['MAX_PAGE_SIZE'] = int(os.getenv('MAX_PAGE_SIZE', 500))
+
+# Most assignments accepted by one bulk request
+app.config['BULK_ASSIGNMENT_LIMIT'] = int(os.getenv('BULK_ASSIGNMENT_LIMIT', 1000))
+
+# Called for Flask and async requests alike, possibly after the request context is gone
+def report_over_budget(stats):
+    logger.warning("%s issued %d Mongo commands, budget is %d",
+                   stats.endpoint, stats.commands, app.config['MONGO_COMMAND_BUDGET'],
+                   extra={'endpoint': stats.endpoint, 'mongo_commands': stats.commands})
+
+metrics = Metrics(app.config['MONGO_COMMAND_BUDGET'], on_over_budget=report_over_budget)
+
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Next-Page', 'X-Total-Count', 'ETag', 'Last-Modified', 'X-Request-ID'])
+mongo = PyMongo(
+    app,
+    event_listeners=[metrics],
+    maxPoolSize=app.config['MONGO_MAX_POOL_SIZE'],
+    minPoolSize=app.config['MONGO_MIN_POOL_SIZE'],
+    waitQueueTimeoutMS=app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS']
+)
+
+# Tag every log record of a request with its id; callers may supply their own
+@app.before_request
+def assign_request_id():
+    request_id.set(request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex)
+
+@app.after_request
+def add_request_id_header(response):
+    response.headers['X-Request-ID'] = request_id.get()
+    return response
+
+@app.teardown_request
+def clear_request_id(exc):
+    request_id.set(None)
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request(request.endpoint)
+
+@app.after_request
+def finish_request_metrics(response):
+    # Streamed bodies (CSV export, SSE) run their queries while being sent, so
+    # those requests are closed out once the body has been consumed
+    if response.is_streamed:
+        method, status_code = request.method, response.status_code
+        response.call_on_close(lambda: metrics.finish_request(method, status_code))
+    else:
+        metrics.finish_request(request.method, response.status_code)
+    return response
+
+# JSON provider with native ObjectId/datetime handling; datetimes are naive UTC
+# from Mongo and serialize as ISO 8601 with a trailing 'Z'
+def json_default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        return o.isoformat() + 'Z'
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    
+    class FastJSONProvider(JSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=json_default, option=ORJSON_OPTIONS).decode()
+        
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+        
+        # Skip the bytes -> str -> bytes round trip for responses
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            body = orjson.dumps(obj, default=json_default, option=ORJSON_OPTIONS)
+            return self._app.response_class(body, mimetype='application/json')
+else:
+    class FastJSONProvider(DefaultJSONProvider):
+        sort_keys = False
+        default = staticmethod(json_default)
+
+app.json = FastJSONProvider(app)
+
+# Bounded LRU of verified tokens, keyed by the SHA-256 of the token, holding the
+# decoded claims until the token's exp. Revoked token hashes live in the
+# revoked_tokens collection (TTL-expired at exp) and are re-read every
+# TOKEN_REVOCATION_SYNC seconds, so a revocation reaches every worker process.
+class TokenCache:
+    def __init__(self, maxsize, sync_interval):
+        self.maxsize = maxsize
+        self.sync_interval = sync_interval
+        self._entries = OrderedDict()
+        self._revoked = frozenset()
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def put(self, key, claims):
+        with self._lock:
+            self._entries[key] = (claims, claims.get('exp', time.time()))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def is_revoked(self, key):
+        if time.monotonic() >= self._next_sync:
+            self.sync_revocations()
+        return key in self._revoked
+    
+    def sync_revocations(self):
+        self._next_sync = time.monotonic() + self.sync_interval
+        try:
+            self._revoked = frozenset(doc['_id'] for doc in mongo.db.revoked_tokens.find(
+                {'expires_at': {'$gt': datetime.utcnow()}}, {'_id': 1}
+            ))
+        except Exception as e:
+            logger.warning("Could not refresh revoked tokens: %s", e)
+    
+    def revoke(self, token, claims):
+        key = self.key(token)
+        expires_at = datetime.utcfromtimestamp(claims.get('exp', time.time()))
+        mongo.db.revoked_tokens.update_one(
+            {'_id': key}, {'$set': {'expires_at': expires_at}}, upsert=True
+        )
+        with self._lock:
+            self._entries.pop(key, None)
+            self._revoked = self._revoked | {key}
 
-CORS(app)
-mongo = PyMongo(app)
+token_cache = TokenCache(app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_REVOCATION_SYNC'])
 
-# JSON encoder to handle ObjectId and datetime properly
-class JSONEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, ObjectId):
-            return str(o)
-        if isinstance(o, datetime):
-            return o.isoformat() + 'Z'
-        return json.JSONEncoder.default(self, o)
+class TokenRevokedError(jwt.InvalidTokenError):
+    pass
 
-app.json_encoder = JSONEncoder
+def bearer_token(header):
+    return header[7:] if header.startswith('Bearer ') else header
+
+# Decoded claims of a valid, unrevoked token; raises a jwt.InvalidTokenError otherwise
+def verified_claims(token):
+    key = TokenCache.key(token)
+    if token_cache.is_revoked(key):
+        raise TokenRevokedError()
+    
+    claims = token_cache.get(key)
+    if claims is None:
+        claims = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        token_cache.put(key, claims)
+    return claims
+
+# Verify an Authorization header; returns (username, None) or (None, error message)
+def verify_token(token):
+    if not token:
+        return None, 'Token is missing'
+    
+    try:
+        data = verified_claims(bearer_token(token))
+        return data['username'], None
+    except jwt.ExpiredSignatureError:
+        return None, 'Token has expired'
+    except TokenRevokedError:
+        return None, 'Token has been revoked'
+    except jwt.InvalidTokenError:
+        return None, 'Token is invalid'
+    except Exception as e:
+        return None, 'Token verification failed'
 
 # JWT token required decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            return jsonify({'success': False, 'error': 'Token is missing'}), 401
+        current_user, error = verify_token(request.headers.get('Authorization'))
+        if error:
+            return jsonify({'success': False, 'error': error}), 401
         
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+# Conditional GET: a per-collection validator built in one aggregate round trip
+# from the write counter bumped by this API's handlers, the newest _id and the
+# collection count. Other services (mobile app, hospital and police portals)
+# write the same collections without bumping the counter: their inserts and
+# deletes still move the newest _id or the count, but an in-place update does
+# not, so the validator also rolls over every CONDITIONAL_GET_MAX_STALENESS seconds.
+def collection_validator_pipeline(collection_names):
+    pipeline = [
+        {'$match': {'_id': {'$in': list(collection_names)}}},
+        {'$project': {'_id': 0, 'collection': '$_id', 'version': 1, 'updated_at': 1}}
+    ]
+    for name in collection_names:
+        pipeline.append({'$unionWith': {'coll': name, 'pipeline': [
+            {'$sort': {'_id': -1}},
+            {'$limit': 1},
+            {'$project': {'_id': 0, 'collection': {'$literal': name}, 'latest': '$_id'}}
+        ]}})
+        # Metadata count, one document per shard
+        pipeline.append({'$unionWith': {'coll': name, 'pipeline': [
+            {'$collStats': {'count': {}}},
+            {'$project': {'_id': 0, 'collection': {'$literal': name}, 'count': 1}}
+        ]}})
+    return pipeline
+
+def collection_validator(collection_names):
+    state = {name: {'count': 0} for name in collection_names}
+    for doc in mongo.db.collection_versions.aggregate(collection_validator_pipeline(collection_names)):
+        entry = state[doc.pop('collection')]
+        entry['count'] += doc.pop('count', 0)
+        entry.update(doc)
+    
+    staleness = app.config['CONDITIONAL_GET_MAX_STALENESS']
+    window = int(time.time() // staleness)
+    parts = [request.full_path, str(window)]
+    last_modified = datetime.fromtimestamp(window * staleness, timezone.utc)
+    for name in collection_names:
+        entry = state[name]
+        parts.append(f"{name}:{entry['count']}:{entry.get('latest', '')}:{entry.get('version', 0)}")
+        
+        if isinstance(entry.get('latest'), ObjectId):
+            last_modified = max(last_modified, entry['latest'].generation_time)
+        if entry.get('updated_at'):
+            last_modified = max(last_modified, entry['updated_at'].replace(tzinfo=timezone.utc))
+    
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    return etag, last_modified
+
+def bump_collection_version(db, *collection_names):
+    for name in collection_names:
+        db.collection_versions.update_one(
+            {'_id': name},
+            {'$inc': {'version': 1}, '$currentDate': {'updated_at': True}},
+            upsert=True
+        )
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+# Answers If-None-Match / If-Modified-Since with 304 before the handler runs its query
+def conditional_get(*collection_names):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                etag, last_modified = collection_validator(collection_names)
+            except Exception as e:
+                logger.warning("Could not compute validator for %s: %s", request.path, e)
+                return f(*args, **kwargs)
+            
+            if is_not_modified(etag, last_modified):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            # Weak, so the validator survives gzip/br content encoding
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated
+    return decorator
+
+# Resolve user names for a batch of incidents with a single $in query. The
+# filter and the mapping are shared with the async handlers in asgi.py.
+USER_NAME_FIELDS = {'email': 1, 'name': 1}
+
+def user_names_filter(incidents):
+    emails = {
+        incident.get('user_email') for incident in incidents
+        if incident.get('user_email') and not incident.get('user_name')
+    }
+    return {'email': {'$in': list(emails)}} if emails else None
+
+def user_names_map(users):
+    return {user.get('email'): user.get('name') for user in users}
+
+def resolve_user_names(incidents):
+    query = user_names_filter(incidents)
+    if query is None:
+        return {}
+    return user_names_map(mongo.db.users.find(query, USER_NAME_FIELDS))
+
+def incident_user_name(incident, user_names):
+    return incident.get('user_name') or user_names.get(incident.get('user_email')) or 'Unknown User'
+
+# Response schemas: each maps a returned field to its default. The same schema
+# builds the Mongo projection, so only fields that are returned leave the database.
+INCIDENT_SCHEMA = {
+    'incident_id': None,
+    'user_email': None,
+    'user_name': None,
+    'lat': None,
+    'lng': None,
+    'accel_mag': None,
+    'speed': 0,
+    'metadata': {},
+    'timestamp': None,
+    'emails_sent': 0
+}
+
+INCIDENT_SUMMARY_SCHEMA = {
+    'user_name': None,
+    'user_email': None,
+    'lat': None,
+    'lng': None,
+    'timestamp': None
+}
+
+AMBULANCE_SCHEMA = {
+    'vehicle_number': None,
+    'driver_name': None,
+    'phone': None,
+    'status': None,
+    'hospital_name': None,
+    'current_incident_id': None
+}
+
+AMBULANCE_DETAIL_SCHEMA = {**AMBULANCE_SCHEMA, 'assignment_time': None}
+
+HOSPITAL_SCHEMA = {
+    'hospital_name': None,
+    'email': None,
+    'phone': None,
+    'location': None
+}
+
+POLICE_OFFICER_SCHEMA = {
+    'username': None,
+    'email': None,
+    'full_name': None,
+    'police_station': None,
+    'designation': None,
+    'role': None,
+    'status': 'active',
+    'created_at': None,
+    'last_login': None
+}
+
+def projection(schema, *extra_fields):
+    fields = {field: 1 for field in schema}
+    fields.update({field: 1 for field in extra_fields})
+    return fields
+
+def serialize(document, schema, id_field='_id'):
+    data = {id_field: str(document.get('_id'))}
+    for field, default in schema.items():
+        data[field] = document.get(field, default)
+    return data
+
+def serialize_incident(incident, user_names):
+    data = serialize(incident, INCIDENT_SCHEMA)
+    data['user_name'] = incident_user_name(incident, user_names)
+    data['created_at'] = data['timestamp']
+    return data
+
+# Opaque keyset cursors over the (timestamp desc, _id desc) incident ordering
+def encode_cursor(incident):
+    timestamp = incident.get('timestamp')
+    payload = {
+        't': timestamp.isoformat() if isinstance(timestamp, datetime) else None,
+        'id': str(incident['_id'])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        timestamp = datetime.fromisoformat(payload['t']) if payload.get('t') else None
+        return timestamp, ObjectId(payload['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+# Positive integer query param, bounded above; raises ValueError when out of range
+def parse_bounded_int(value, name, default, maximum):
+    if value is None or value == '':
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer')
+    if not 1 <= number <= maximum:
+        raise ValueError(f'{name} must be between 1 and {maximum}')
+    return number
+
+def parse_limit(value, default=50):
+    return parse_bounded_int(value, 'limit', default, app.config['MAX_PAGE_SIZE'])
+
+def parse_page(value):
+    return parse_bounded_int(value, 'page', 1, 10 ** 6)
+
+# Optional search radius in km; raises ValueError unless it is a positive number
+def parse_max_km(value):
+    if value is None or value == '':
+        return None
+    try:
+        max_km = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('max_km must be a number')
+    if not 0 < max_km < math.inf:
+        raise ValueError('max_km must be a positive number')
+    return max_km
+
+# Match everything that sorts after the cursor; null timestamps sort last
+def keyset_filter(cursor):
+    if not cursor:
+        return {}
+    timestamp, last_id = decode_cursor(cursor)
+    if timestamp is None:
+        return {'timestamp': None, '_id': {'$lt': last_id}}
+    return {
+        '$or': [
+            {'timestamp': {'$lt': timestamp}},
+            {'timestamp': timestamp, '_id': {'$lt': last_id}},
+            {'timestamp': None}
+        ]
+    }
+
+# One page of the incident list as (query, skip, limit). Cursor mode seeks
+# straight to the page via the (timestamp, _id) index; page mode keeps the old
+# skip-based contract. Raises ValueError for a bad page, limit or cursor.
+def incidents_page_query(args):
+    page = parse_page(args.get('page'))
+    limit = parse_limit(args.get('limit'))
+    after = args.get('after')
+    if after:
+        return keyset_filter(after), 0, limit
+    return {}, (page - 1) * limit, limit
+
+# Works on a pymongo or a Motor database; fetches one row past the page
+def find_incidents_page(db, query, skip, limit):
+    return db.incidents.find(query, projection(INCIDENT_SCHEMA)) \
+        .sort([('timestamp', -1), ('_id', -1)]).skip(skip).limit(limit + 1)
+
+# Cut the extra row off a page; returns (documents, next cursor or None)
+def split_page(documents, limit):
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(documents[-1])
+
+# Index bootstrap: build missing indexes off the request path at startup
+def bootstrap_indexes():
+    try:
+        created = ensure_indexes(mongo.db)
+        if created:
+            logger.info("Created indexes: %s", ', '.join(created))
+    except Exception as e:
+        logger.exception("Index bootstrap failed: %s", e)
+
+if app.config['ENSURE_INDEXES']:
+    threading.Thread(target=bootstrap_indexes, name='index-bootstrap', daemon=True).start()
+
+# Materialized dashboard statistics, kept current by a background maintainer
+stats_rollups = StatsRollups(mongo.db, interval=app.config['STATS_ROLLUP_INTERVAL'])
+
+if app.config['STATS_ROLLUPS']:
+    stats_rollups.start()
+
+# Rollup totals when rollups are enabled and built, else None (read live data instead)
+def rollup_totals():
+    if not app.config['STATS_ROLLUPS']:
+        return None
+    totals = stats_rollups.totals()
+    return totals if totals and 'total' in totals else None
+
+# Delete incidents through the API, keeping rollups in step when they are enabled
+def delete_incidents(query):
+    if not app.config['STATS_ROLLUPS']:
+        return mongo.db.incidents.delete_many(query)
+    return stats_rollups.delete_incidents(query)
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Regenerate stats_rollups from scratch and verify them against live counts."""
+    total = stats_rollups.rebuild()
+    print(f"Rebuilt stats rollups from {total} incidents")
+    mismatches = stats_rollups.verify()
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    print("Rollups match live counts" if not mismatches else f"{len(mismatches)} mismatches")
+
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Create any missing indexes declared in indexes.py."""
+    created = ensure_indexes(mongo.db)
+    print(f"Created {len(created)} indexes" + (f": {', '.join(created)}" if created else ''))
+
+@app.cli.command('diagnose-queries')
+def diagnose_queries_command():
+    """Explain the app's query patterns and report any COLLSCAN."""
+    report = diagnose_queries(mongo.db)
+    for entry in report:
+        status = 'COLLSCAN' if entry['collscan'] else 'ok'
+        print(f"{status:<10}{entry['collection']:<22}{entry['filter']} sort={entry['sort']}")
+    collscans = sum(entry['collscan'] for entry in report)
+    print(f"{collscans} of {len(report)} query patterns scan their collection")
+
+# Small in-process TTL cache; concurrent misses on a key share one computation
+class TTLCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get_or_compute(self, key, compute):
+        entry = self._entries.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            value = compute()
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            return value
+
+stats_cache = TTLCache(app.config['STATS_CACHE_TTL'])
+
+# Dashboard assets, minified and precompressed once at startup
+static_assets = StaticAssets(app.root_path, ['styles.css', 'admin_dashboard.html'])
+
+def asset_response(asset):
+    # Fingerprinted URLs never change content, so they can be cached for a year
+    if request.args.get('v') == asset.etag:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'no-cache'
+
+    if request.if_none_match.contains_weak(asset.etag):
+        response = app.response_class(status=304)
+    else:
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'), list(asset.encoded))
+        response = app.response_class(asset.encoded.get(encoding, asset.body), mimetype=asset.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(asset.etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+# Each worker process keeps its own counters. They are published to
+# metrics_snapshots (one document per process, TTL-expired an hour after its
+# last update) and /metrics sums them, so a scrape through the load balancer
+# sees the whole deployment whichever worker answers it.
+METRICS_INSTANCE = f'{socket.gethostname()}:{os.getpid()}'
+
+def publish_metrics():
+    mongo.db.metrics_snapshots.replace_one(
+        {'_id': METRICS_INSTANCE},
+        {'endpoints': metrics.snapshot(), 'updated_at': datetime.utcnow()},
+        upsert=True
+    )
+
+def run_metrics_publisher():
+    while True:
+        time.sleep(app.config['METRICS_PUBLISH_INTERVAL'])
         try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = data['username']
-        except jwt.ExpiredSignatureError:
-            return jsonify({'success': False, 'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'success': False, 'error': 'Token is invalid'}), 401
+            publish_metrics()
         except Exception as e:
-            return jsonify({'success': False, 'error': 'Token verification failed'}), 401
+            logger.warning("Could not publish metrics: %s", e)
+
+if app.config['METRICS_TOKEN'] and app.config['METRICS_PUBLISH_INTERVAL'] > 0:
+    threading.Thread(target=run_metrics_publisher, name='metrics-publisher', daemon=True).start()
+
+# Prometheus scrape endpoint; disabled unless METRICS_TOKEN is set
+@app.route('/metrics')
+def get_metrics():
+    token = app.config['METRICS_TOKEN']
+    if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+    
+    try:
+        publish_metrics()
+        snapshots = [doc['endpoints'] for doc in mongo.db.metrics_snapshots.find({}, {'endpoints': 1})]
+        return Response(metrics.render(snapshots), mimetype='text/plain; version=0.0.4')
         
-        return f(current_user, *args, **kwargs)
-    return decorated
+    except Exception as e:
+        logger.exception("Error in get_metrics: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 # Serve the admin dashboard
 @app.route('/')
 def serve_dashboard():
-    return send_from_directory('.', 'admin_dashboard.html')
+    return asset_response(static_assets.get('admin_dashboard.html'))
 
 # Serve static files
 @app.route('/<path:path>')
 def serve_static(path):
+    asset = static_assets.get(path)
+    if asset:
+        return asset_response(asset)
     return send_from_directory('.', path)
 
+# Compress JSON and other text responses above COMPRESS_MIN_SIZE; streamed
+# responses (CSV export, SSE) and static files are left as they are
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 # Routes
 @app.route('/admin/login', methods=['POST'])
 def admin_login():
@@ -95,47 +782,40 @@ def admin_login():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Revoke the presented token in every worker process
+@app.route('/admin/logout', methods=['POST'])
+@token_required
+def admin_logout(current_user):
+    try:
+        token = bearer_token(request.headers.get('Authorization'))
+        token_cache.revoke(token, verified_claims(token))
+        return jsonify({'success': True, 'message': 'Logged out'})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/dashboard/incidents', methods=['GET'])
 @token_required
 def get_incidents(current_user):
     try:
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 50))
-        skip = (page - 1) * limit
+        try:
+            query, skip, limit = incidents_page_query(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        incidents_cursor = mongo.db.incidents.find().sort('timestamp', -1).skip(skip).limit(limit)
-        incidents = list(incidents_cursor)
+        incidents, next_cursor = split_page(list(find_incidents_page(mongo.db, query, skip, limit)), limit)
         
-        processed_incidents = []
-        for incident in incidents:
-            user_data = mongo.db.users.find_one({'email': incident.get('user_email')})
-            
-            timestamp = incident.get('timestamp')
-            if timestamp and isinstance(timestamp, datetime):
-                timestamp_str = timestamp.isoformat() + 'Z'
-            else:
-                timestamp_str = timestamp
-            
-            processed_incident = {
-                '_id': str(incident.get('_id')),
-                'incident_id': incident.get('incident_id'),
-                'user_email': incident.get('user_email'),
-                'user_name': incident.get('user_name') or (user_data.get('name') if user_data else 'Unknown User'),
-                'lat': incident.get('lat'),
-                'lng': incident.get('lng'),
-                'accel_mag': incident.get('accel_mag'),
-                'speed': incident.get('speed', 0),
-                'metadata': incident.get('metadata', {}),
-                'timestamp': timestamp_str,
-                'created_at': timestamp_str,
-                'emails_sent': incident.get('emails_sent', 0)
-            }
-            processed_incidents.append(processed_incident)
+        user_names = resolve_user_names(incidents)
         
-        return jsonify(processed_incidents)
+        processed_incidents = [serialize_incident(incident, user_names) for incident in incidents]
+        
+        response = jsonify(processed_incidents)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
         
     except Exception as e:
-        print(f"Error in get_incidents: {str(e)}")
+        logger.exception("Error in get_incidents: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
     
 @app.route('/admin/ambulance-assignments', methods=['GET'])
@@ -145,7 +825,7 @@ def get_ambulance_assignments(current_user):
         # Get all ambulances that are assigned to incidents
         assigned_ambulances = list(mongo.db.ambulances.find({
             'current_incident_id': {'$exists': True, '$ne': None}
-        }))
+        }, projection(AMBULANCE_SCHEMA)))
         
         # Get incident details for each assigned ambulance
         assignments_with_details = []
@@ -155,31 +835,16 @@ def get_ambulance_assignments(current_user):
             
             if incident_id:
                 try:
-                    incident = mongo.db.incidents.find_one({'_id': ObjectId(incident_id)})
+                    incident = mongo.db.incidents.find_one({'_id': ObjectId(incident_id)}, projection(INCIDENT_SUMMARY_SCHEMA))
                 except:
                     # Try finding by incident_id field if _id search fails
-                    incident = mongo.db.incidents.find_one({'incident_id': incident_id})
+                    incident = mongo.db.incidents.find_one({'incident_id': incident_id}, projection(INCIDENT_SUMMARY_SCHEMA))
             
-            assignment_data = {
-                'ambulance_id': str(ambulance.get('_id')),
-                'vehicle_number': ambulance.get('vehicle_number'),
-                'driver_name': ambulance.get('driver_name'),
-                'phone': ambulance.get('phone'),
-                'status': ambulance.get('status'),
-                'hospital_name': ambulance.get('hospital_name'),
-                'current_incident_id': ambulance.get('current_incident_id'),
-                'incident_details': None
-            }
+            assignment_data = serialize(ambulance, AMBULANCE_SCHEMA, id_field='ambulance_id')
+            assignment_data['incident_details'] = None
             
             if incident:
-                assignment_data['incident_details'] = {
-                    'incident_id': str(incident.get('_id')),
-                    'user_name': incident.get('user_name'),
-                    'user_email': incident.get('user_email'),
-                    'lat': incident.get('lat'),
-                    'lng': incident.get('lng'),
-                    'timestamp': incident.get('timestamp')
-                }
+                assignment_data['incident_details'] = serialize(incident, INCIDENT_SUMMARY_SCHEMA, id_field='incident_id')
             
             assignments_with_details.append(assignment_data)
         
@@ -190,14 +855,14 @@ def get_ambulance_assignments(current_user):
         })
         
     except Exception as e:
-        print(f"Error in get_ambulance_assignments: {str(e)}")
+        logger.exception("Error in get_ambulance_assignments: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/ambulances/<ambulance_id>', methods=['GET'])
 @token_required
 def get_ambulance_details(current_user, ambulance_id):
     try:
-        ambulance = mongo.db.ambulances.find_one({'_id': ObjectId(ambulance_id)})
+        ambulance = mongo.db.ambulances.find_one({'_id': ObjectId(ambulance_id)}, projection(AMBULANCE_DETAIL_SCHEMA))
         
         if not ambulance:
             return jsonify({'success': False, 'error': 'Ambulance not found'}), 404
@@ -205,48 +870,27 @@ def get_ambulance_details(current_user, ambulance_id):
         # Get incident details if assigned
         incident_details = None
         if ambulance.get('current_incident_id'):
-            incident = mongo.db.incidents.find_one({'_id': ObjectId(ambulance['current_incident_id'])})
+            incident = mongo.db.incidents.find_one({'_id': ObjectId(ambulance['current_incident_id'])}, projection(INCIDENT_SUMMARY_SCHEMA))
             if incident:
-                incident_details = {
-                    'incident_id': str(incident.get('_id')),
-                    'user_name': incident.get('user_name'),
-                    'user_email': incident.get('user_email'),
-                    'lat': incident.get('lat'),
-                    'lng': incident.get('lng'),
-                    'timestamp': incident.get('timestamp')
-                }
+                incident_details = serialize(incident, INCIDENT_SUMMARY_SCHEMA, id_field='incident_id')
         
-        ambulance_data = {
-            '_id': str(ambulance.get('_id')),
-            'vehicle_number': ambulance.get('vehicle_number'),
-            'driver_name': ambulance.get('driver_name'),
-            'phone': ambulance.get('phone'),
-            'status': ambulance.get('status'),
-            'hospital_name': ambulance.get('hospital_name'),
-            'current_incident_id': ambulance.get('current_incident_id'),
-            'assignment_time': ambulance.get('assignment_time'),
-            'incident_details': incident_details
-        }
+        ambulance_data = serialize(ambulance, AMBULANCE_DETAIL_SCHEMA)
+        ambulance_data['incident_details'] = incident_details
         
         return jsonify(ambulance_data)
         
     except Exception as e:
-        print(f"Error in get_ambulance_details: {str(e)}")
+        logger.exception("Error in get_ambulance_details: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/ambulances/<ambulance_id>/unassign', methods=['POST'])
 @token_required
 def unassign_ambulance(current_user, ambulance_id):
     try:
-        result = mongo.db.ambulances.update_one(
-            {'_id': ObjectId(ambulance_id)},
-            {'$set': {
-                'current_incident_id': None,
-                'assignment_time': None
-            }}
-        )
+        released = release_ambulance(mongo.db, ObjectId(ambulance_id))
         
-        if result.modified_count == 1:
+        if released:
+            bump_collection_version(mongo.db, 'ambulances')
             return jsonify({'success': True, 'message': 'Ambulance unassigned successfully'})
         else:
             return jsonify({'success': False, 'error': 'Ambulance not found or already unassigned'}), 404
@@ -261,6 +905,7 @@ def delete_ambulance(current_user, ambulance_id):
         result = mongo.db.ambulances.delete_one({'_id': ObjectId(ambulance_id)})
         
         if result.deleted_count == 1:
+            bump_collection_version(mongo.db, 'ambulances')
             return jsonify({'success': True, 'message': 'Ambulance deleted successfully'})
         else:
             return jsonify({'success': False, 'error': 'Ambulance not found'}), 404
@@ -273,47 +918,27 @@ def delete_ambulance(current_user, ambulance_id):
 @token_required
 def get_incident_details(current_user, incident_id):
     try:
-        incident = mongo.db.incidents.find_one({'_id': ObjectId(incident_id)})
+        incident = mongo.db.incidents.find_one({'_id': ObjectId(incident_id)}, projection(INCIDENT_SCHEMA))
         
         if not incident:
             return jsonify({'success': False, 'error': 'Incident not found'}), 404
         
-        user_data = mongo.db.users.find_one({'email': incident.get('user_email')})
-        
-        timestamp = incident.get('timestamp')
-        if timestamp and isinstance(timestamp, datetime):
-            timestamp_str = timestamp.isoformat() + 'Z'
-        else:
-            timestamp_str = timestamp
+        user_names = resolve_user_names([incident])
         
-        processed_incident = {
-            '_id': str(incident.get('_id')),
-            'incident_id': incident.get('incident_id'),
-            'user_email': incident.get('user_email'),
-            'user_name': incident.get('user_name') or (user_data.get('name') if user_data else 'Unknown User'),
-            'lat': incident.get('lat'),
-            'lng': incident.get('lng'),
-            'accel_mag': incident.get('accel_mag'),
-            'speed': incident.get('speed', 0),
-            'metadata': incident.get('metadata', {}),
-            'timestamp': timestamp_str,
-            'created_at': timestamp_str,
-            'emails_sent': incident.get('emails_sent', 0)
-        }
-        
-        return jsonify(processed_incident)
+        return jsonify(serialize_incident(incident, user_names))
         
     except Exception as e:
-        print(f"Error in get_incident_details: {str(e)}")
+        logger.exception("Error in get_incident_details: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/dashboard/incidents/<incident_id>', methods=['DELETE'])
 @token_required
 def delete_incident(current_user, incident_id):
     try:
-        result = mongo.db.incidents.delete_one({'_id': ObjectId(incident_id)})
+        result = delete_incidents({'_id': ObjectId(incident_id)})
         
         if result.deleted_count == 1:
+            bump_collection_version(mongo.db, 'incidents')
             return jsonify({'success': True, 'message': 'Incident deleted successfully'})
         else:
             return jsonify({'success': False, 'error': 'Incident not found'}), 404
@@ -321,98 +946,232 @@ def delete_incident(current_user, incident_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Parse a from/to query param; date-only values for "to" cover the whole day
+def parse_date_param(value, end_of_day=False):
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.rstrip('Z'))
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+EXPORT_COLUMNS = [
+    'Incident ID', 'User Name', 'User Email', 'Type', 'Latitude', 'Longitude',
+    'Google Maps Link', 'Acceleration (m/s²)', 'Speed (km/h)', 'Timestamp', 'Status'
+]
+
+EXPORT_PROJECTION = projection(
+    ['incident_id', 'user_name', 'user_email', 'lat', 'lng', 'accel_mag', 'speed', 'timestamp'],
+    'metadata.manual', 'metadata.sos_type'
+)
+
+def incident_csv_row(incident, user_names):
+    is_manual = incident.get('metadata', {}).get('manual', False)
+    sos_type = incident.get('metadata', {}).get('sos_type', '')
+    incident_type = "Manual SOS (Self)" if (is_manual and sos_type == 'self') else \
+                   "Manual SOS (Others)" if (is_manual and sos_type == 'other') else \
+                   "Auto-detected"
+    
+    status = "Manual" if is_manual else "Auto"
+    
+    timestamp = incident.get('timestamp')
+    if timestamp and isinstance(timestamp, datetime):
+        timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        timestamp_str = str(timestamp)
+    
+    lat = incident.get('lat')
+    lng = incident.get('lng')
+    maps_link = f"https://www.google.com/maps?q={lat},{lng}" if lat and lng else "N/A"
+    
+    return [
+        incident.get('incident_id', ''),
+        incident_user_name(incident, user_names),
+        incident.get('user_email', ''),
+        incident_type,
+        lat,
+        lng,
+        maps_link,
+        incident.get('accel_mag', ''),
+        incident.get('speed', ''),
+        timestamp_str,
+        status
+    ]
+
 @app.route('/dashboard/incidents/export', methods=['GET'])
 @token_required
 def export_incidents_csv(current_user):
     try:
-        incidents_cursor = mongo.db.incidents.find().sort('timestamp', -1)
-        incidents = list(incidents_cursor)
-        
-        csv_content = "Incident ID,User Name,User Email,Type,Latitude,Longitude,Google Maps Link,Acceleration (m/s²),Speed (km/h),Timestamp,Status\n"
-        
-        for incident in incidents:
-            is_manual = incident.get('metadata', {}).get('manual', False)
-            sos_type = incident.get('metadata', {}).get('sos_type', '')
-            incident_type = "Manual SOS (Self)" if (is_manual and sos_type == 'self') else \
-                           "Manual SOS (Others)" if (is_manual and sos_type == 'other') else \
-                           "Auto-detected"
-            
-            status = "Manual" if is_manual else "Auto"
-            
-            user_data = mongo.db.users.find_one({'email': incident.get('user_email')})
-            user_name = incident.get('user_name') or (user_data.get('name') if user_data else 'Unknown User')
-            
-            timestamp = incident.get('timestamp')
-            if timestamp and isinstance(timestamp, datetime):
-                timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                timestamp_str = str(timestamp)
-            
-            lat = incident.get('lat')
-            lng = incident.get('lng')
-            maps_link = f"https://www.google.com/maps?q={lat},{lng}" if lat and lng else "N/A"
+        try:
+            date_from = parse_date_param(request.args.get('from'))
+            date_to = parse_date_param(request.args.get('to'), end_of_day=True)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid from/to date, expected ISO 8601'}), 400
+        
+        query = {}
+        if date_from or date_to:
+            query['timestamp'] = {}
+            if date_from:
+                query['timestamp']['$gte'] = date_from
+            if date_to:
+                query['timestamp']['$lt'] = date_to
+        
+        batch_size = app.config['EXPORT_BATCH_SIZE']
+        incidents_cursor = mongo.db.incidents.find(query, EXPORT_PROJECTION).sort('timestamp', -1).batch_size(batch_size)
+        
+        # Stream the CSV one cursor batch at a time so memory stays flat
+        def generate():
+            buffer = StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
             
-            csv_content += f'"{incident.get("incident_id", "")}","{user_name}","{incident.get("user_email", "")}",'
-            csv_content += f'"{incident_type}",{lat},{lng},'
-            csv_content += f'"{maps_link}",{incident.get("accel_mag", "")},{incident.get("speed", "")},'
-            csv_content += f'"{timestamp_str}","{status}"\n'
+            batch = []
+            try:
+                for incident in incidents_cursor:
+                    batch.append(incident)
+                    if len(batch) < batch_size:
+                        continue
+                    user_names = resolve_user_names(batch)
+                    writer.writerows(incident_csv_row(item, user_names) for item in batch)
+                    batch = []
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate(0)
+                
+                if batch:
+                    user_names = resolve_user_names(batch)
+                    writer.writerows(incident_csv_row(item, user_names) for item in batch)
+                yield buffer.getvalue()
+            finally:
+                incidents_cursor.close()
         
         filename = f"incidents_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
         
         return Response(
-            csv_content,
+            stream_with_context(generate()),
             mimetype="text/csv",
             headers={"Content-disposition": f"attachment; filename={filename}"}
         )
         
     except Exception as e:
-        print(f"Error in export_incidents_csv: {str(e)}")
+        logger.exception("Error in export_incidents_csv: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/users', methods=['GET'])
 @token_required
+@conditional_get('users', 'profiles', 'contacts', 'incidents')
 def get_users(current_user):
     try:
-        users_cursor = mongo.db.users.find()
-        users = list(users_cursor)
+        try:
+            page = parse_page(request.args.get('page'))
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        skip = (page - 1) * limit
+        
+        # One round trip: page the users (plus one, to detect a next page), then
+        # join profile, contacts and incident stats
+        pipeline = [
+            {'$sort': {'_id': -1}},
+            {'$skip': skip},
+            {'$limit': limit + 1},
+            {
+                '$lookup': {
+                    'from': 'profiles',
+                    'localField': 'email',
+                    'foreignField': 'user_email',
+                    'as': 'profile'
+                }
+            },
+            {
+                '$lookup': {
+                    'from': 'contacts',
+                    'localField': 'email',
+                    'foreignField': 'user_email',
+                    'as': 'emergency_contacts'
+                }
+            },
+            {
+                '$lookup': {
+                    'from': 'incidents',
+                    'localField': 'email',
+                    'foreignField': 'user_email',
+                    'pipeline': [
+                        {
+                            '$group': {
+                                '_id': None,
+                                'total_incidents': {'$sum': 1},
+                                'last_incident': {'$max': '$timestamp'}
+                            }
+                        }
+                    ],
+                    'as': 'incident_stats'
+                }
+            },
+            {
+                '$set': {
+                    'profile': {'$arrayElemAt': ['$profile', 0]},
+                    'incident_stats': {'$arrayElemAt': ['$incident_stats', 0]}
+                }
+            }
+        ]
+        users = list(mongo.db.users.aggregate(pipeline))
+        has_next = len(users) > limit
+        users = users[:limit]
         
         users_with_details = []
         for user in users:
-            profile = mongo.db.profiles.find_one({'user_email': user.get('email')})
-            emergency_contacts = list(mongo.db.contacts.find({'user_email': user.get('email')}))
-            user_incidents = list(mongo.db.incidents.find({'user_email': user.get('email')}))
-            
-            created_at = user.get('created_at')
-            if created_at and isinstance(created_at, datetime):
-                created_at_str = created_at.isoformat() + 'Z'
-            else:
-                created_at_str = created_at
-            
-            last_incident = user_incidents[0].get('timestamp') if user_incidents else None
-            if last_incident and isinstance(last_incident, datetime):
-                last_incident_str = last_incident.isoformat() + 'Z'
-            else:
-                last_incident_str = last_incident
+            incident_stats = user.get('incident_stats') or {}
             
             user_data = {
                 '_id': str(user.get('_id')),
                 'name': user.get('name'),
                 'email': user.get('email'),
                 'username': user.get('username'),
-                'created_at': created_at_str,
-                'profile': profile,
-                'emergency_contacts': emergency_contacts,
-                'total_incidents': len(user_incidents),
-                'last_incident': last_incident_str
+                'created_at': user.get('created_at'),
+                'profile': user.get('profile'),
+                'emergency_contacts': user.get('emergency_contacts', []),
+                'total_incidents': incident_stats.get('total_incidents', 0),
+                'last_incident': incident_stats.get('last_incident')
             }
             users_with_details.append(user_data)
         
-        return jsonify(users_with_details)
+        # Paging metadata travels in headers so the body stays a plain list;
+        # the total comes from collection metadata and may be slightly stale
+        response = jsonify(users_with_details)
+        response.headers['X-Total-Count'] = str(mongo.db.users.estimated_document_count())
+        if has_next:
+            response.headers['X-Next-Page'] = str(page + 1)
+        return response
         
     except Exception as e:
-        print(f"Error in get_users: {str(e)}")
+        logger.exception("Error in get_users: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# The lookups behind a user's detail view: the profile, then cursors over the
+# contacts and the ten latest incidents. On a Motor database (asgi.py) the
+# profile comes back as an awaitable, so the three can run concurrently.
+def user_detail_queries(db, email):
+    return (
+        db.profiles.find_one({'user_email': email}),
+        db.contacts.find({'user_email': email}),
+        db.incidents.find({'user_email': email}).sort('timestamp', -1).limit(10)
+    )
+
+def user_details_response(user, profile, emergency_contacts, user_incidents):
+    return {
+        '_id': str(user.get('_id')),
+        'name': user.get('name'),
+        'email': user.get('email'),
+        'username': user.get('username'),
+        'created_at': user.get('created_at'),
+        'profile': profile,
+        'emergency_contacts': emergency_contacts,
+        'total_incidents': len(user_incidents),
+        'recent_incidents': user_incidents,
+        'last_incident': user_incidents[0].get('timestamp') if user_incidents else None
+    }
+
 @app.route('/admin/users/<user_id>', methods=['GET'])
 @token_required
 def get_user_details(current_user, user_id):
@@ -422,131 +1181,167 @@ def get_user_details(current_user, user_id):
         if not user:
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
-        profile = mongo.db.profiles.find_one({'user_email': user.get('email')})
-        emergency_contacts = list(mongo.db.contacts.find({'user_email': user.get('email')}))
-        user_incidents = list(mongo.db.incidents.find({'user_email': user.get('email')}).sort('timestamp', -1).limit(10))
+        profile, contacts_cursor, incidents_cursor = user_detail_queries(mongo.db, user.get('email'))
         
-        created_at = user.get('created_at')
-        if created_at and isinstance(created_at, datetime):
-            created_at_str = created_at.isoformat() + 'Z'
-        else:
-            created_at_str = created_at
-        
-        last_incident = user_incidents[0].get('timestamp') if user_incidents else None
-        if last_incident and isinstance(last_incident, datetime):
-            last_incident_str = last_incident.isoformat() + 'Z'
-        else:
-            last_incident_str = last_incident
-        
-        user_data = {
-            '_id': str(user.get('_id')),
-            'name': user.get('name'),
-            'email': user.get('email'),
-            'username': user.get('username'),
-            'created_at': created_at_str,
-            'profile': profile,
-            'emergency_contacts': emergency_contacts,
-            'total_incidents': len(user_incidents),
-            'recent_incidents': user_incidents,
-            'last_incident': last_incident_str
-        }
-        
-        return jsonify(user_data)
+        return jsonify(user_details_response(user, profile, list(contacts_cursor), list(incidents_cursor)))
         
     except Exception as e:
-        print(f"Error in get_user_details: {str(e)}")
+        logger.exception("Error in get_user_details: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# USER DELETION
+# Users are removed immediately; their profiles, contacts and incidents are
+# deleted in batches by a background cleanup job
+cascade_deleter = CascadeDeleter(
+    mongo.db,
+    batch_size=app.config['CLEANUP_BATCH_SIZE'],
+    interval=app.config['CLEANUP_POLL_INTERVAL'],
+    max_attempts=app.config['CLEANUP_MAX_ATTEMPTS'],
+    retry_delay=app.config['CLEANUP_RETRY_DELAY'],
+    delete_incidents=delete_incidents,
+    on_complete=lambda job: bump_collection_version(mongo.db, 'profiles', 'contacts', 'incidents')
+)
+
+if app.config['CLEANUP_JOBS']:
+    cascade_deleter.start()
+
 @app.route('/admin/users/<user_id>', methods=['DELETE'])
 @token_required
 def delete_user(current_user, user_id):
     try:
-        user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
+        user = mongo.db.users.find_one({'_id': ObjectId(user_id)}, {'email': 1})
         if not user:
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
-        user_email = user.get('email')
-        
-        result = mongo.db.users.delete_one({'_id': ObjectId(user_id)})
+        # Related data is keyed by email; a user without one has nothing to clean up.
+        # The job is queued before the user is deleted so a failed enqueue leaves
+        # the user in place for a retry instead of orphaning its data.
+        job_id = cascade_deleter.enqueue_user_cleanup([user['email']]) if user.get('email') else None
+        mongo.db.users.delete_one({'_id': user['_id']})
+        bump_collection_version(mongo.db, 'users')
+        if not job_id:
+            return jsonify({'success': True, 'message': 'User deleted', 'job_id': None})
         
-        if result.deleted_count == 1:
-            mongo.db.profiles.delete_one({'user_email': user_email})
-            mongo.db.contacts.delete_many({'user_email': user_email})
-            mongo.db.incidents.delete_many({'user_email': user_email})
-            
-            return jsonify({'success': True, 'message': 'User and all related data deleted successfully'})
-        else:
-            return jsonify({'success': False, 'error': 'User not found'}), 404
+        return jsonify({
+            'success': True,
+            'message': 'User deleted; related data is being removed',
+            'job_id': str(job_id)
+        }), 202
             
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/admin/users', methods=['DELETE'])
+@token_required
+def delete_users(current_user):
+    try:
+        data = request.get_json(silent=True) or {}
+        user_ids = data.get('ids')
+        
+        if not isinstance(user_ids, list) or not user_ids:
+            return jsonify({'success': False, 'error': 'ids must be a non-empty list'}), 400
+        if len(user_ids) > app.config['BULK_DELETE_LIMIT']:
+            return jsonify({
+                'success': False,
+                'error': f"At most {app.config['BULK_DELETE_LIMIT']} users per request"
+            }), 400
+        
+        invalid = [user_id for user_id in user_ids if not ObjectId.is_valid(user_id)]
+        object_ids = list({ObjectId(user_id) for user_id in user_ids if ObjectId.is_valid(user_id)})
+        
+        users = list(mongo.db.users.find({'_id': {'$in': object_ids}}, {'email': 1}))
+        found = {user['_id'] for user in users}
+        
+        # Queue the cleanup before deleting, as delete_user does
+        emails = [user.get('email') for user in users if user.get('email')]
+        job_id = cascade_deleter.enqueue_user_cleanup(emails) if emails else None
+        deleted = mongo.db.users.delete_many({'_id': {'$in': list(found)}}).deleted_count if found else 0
+        
+        result = {
+            'success': True,
+            'deleted': deleted,
+            'not_found': [str(user_id) for user_id in object_ids if user_id not in found],
+            'invalid': invalid,
+            'job_id': str(job_id) if job_id else None
+        }
+        if deleted:
+            bump_collection_version(mongo.db, 'users')
+        
+        return jsonify(result), 202 if result['job_id'] else 200
+        
+    except Exception as e:
+        logger.exception("Error in delete_users: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/admin/cleanup-jobs/<job_id>', methods=['GET'])
+@token_required
+def get_cleanup_job(current_user, job_id):
+    try:
+        job = cascade_deleter.job(ObjectId(job_id))
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify(job)
+        
+    except Exception as e:
+        logger.exception("Error in get_cleanup_job: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # HOSPITALS ROUTES
 @app.route('/admin/hospitals', methods=['GET'])
 @token_required
+@conditional_get('hospital_user')
 def get_hospitals(current_user):
     try:
-        print("Attempting to fetch hospitals from hospital_user collection...")
+        logger.debug("Fetching hospitals from hospital_user collection")
         
-        hospitals_cursor = mongo.db.hospital_user.find()
+        hospitals_cursor = mongo.db.hospital_user.find({}, projection(HOSPITAL_SCHEMA))
         hospitals_data = list(hospitals_cursor)
         
-        print(f"Found {len(hospitals_data)} hospitals in hospital_user collection")
+        logger.debug("Found %d hospitals in hospital_user collection", len(hospitals_data))
         
         processed_hospitals = []
         for hospital in hospitals_data:
-            hospital_data = {
-                '_id': str(hospital.get('_id')),
-                'hospital_name': hospital.get('hospital_name'),
-                'email': hospital.get('email'),
-                'phone': hospital.get('phone'),
-                'location': hospital.get('location')
-            }
+            hospital_data = serialize(hospital, HOSPITAL_SCHEMA)
             processed_hospitals.append(hospital_data)
-            print(f"Processed hospital: {hospital_data['hospital_name']}")
+            logger.debug("Processed hospital: %s", hospital_data['hospital_name'])
         
-        print(f"Returning {len(processed_hospitals)} hospitals")
+        logger.debug("Returning %d hospitals", len(processed_hospitals))
         return jsonify(processed_hospitals)
         
     except Exception as e:
-        print(f"Error in get_hospitals: {str(e)}")
+        logger.exception("Error in get_hospitals: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/hospitals/<hospital_id>', methods=['GET'])
 @token_required
 def get_hospital_details(current_user, hospital_id):
     try:
-        print(f"Fetching hospital details for ID: {hospital_id} from hospital_user collection")
+        logger.debug("Fetching hospital details for ID: %s", hospital_id)
         
-        hospital = mongo.db.hospital_user.find_one({'_id': ObjectId(hospital_id)})
+        hospital = mongo.db.hospital_user.find_one({'_id': ObjectId(hospital_id)}, projection(HOSPITAL_SCHEMA))
         
         if not hospital:
-            print(f"Hospital not found with ID: {hospital_id}")
+            logger.info("Hospital not found with ID: %s", hospital_id)
             return jsonify({'success': False, 'error': 'Hospital not found'}), 404
         
-        hospital_data = {
-            '_id': str(hospital.get('_id')),
-            'hospital_name': hospital.get('hospital_name'),
-            'email': hospital.get('email'),
-            'phone': hospital.get('phone'),
-            'location': hospital.get('location')
-        }
+        hospital_data = serialize(hospital, HOSPITAL_SCHEMA)
         
         return jsonify(hospital_data)
         
     except Exception as e:
-        print(f"Error in get_hospital_details: {str(e)}")
+        logger.exception("Error in get_hospital_details: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/hospitals/<hospital_id>', methods=['DELETE'])
 @token_required
 def delete_hospital(current_user, hospital_id):
     try:
-        print(f"Attempting to delete hospital: {hospital_id} from hospital_user collection")
+        logger.info("Deleting hospital %s", hospital_id)
         
         result = mongo.db.hospital_user.delete_one({'_id': ObjectId(hospital_id)})
         
         if result.deleted_count == 1:
+            bump_collection_version(mongo.db, 'hospital_user')
             return jsonify({'success': True, 'message': 'Hospital deleted successfully'})
         else:
             return jsonify({'success': False, 'error': 'Hospital not found'}), 404
@@ -554,127 +1349,533 @@ def delete_hospital(current_user, hospital_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# NEAREST HOSPITALS
+EARTH_RADIUS_KM = 6371.0088
+
+# (lat, lng) of a hospital from its GeoJSON point or legacy lat/lng fields
+def hospital_coordinates(hospital):
+    geo = hospital.get('geo')
+    if geo and geo.get('coordinates'):
+        lng, lat = geo['coordinates'][:2]
+        return lat, lng
+    lat = hospital.get('lat', hospital.get('latitude'))
+    lng = hospital.get('lng', hospital.get('longitude'))
+    if lat is None or lng is None:
+        return None
+    return float(lat), float(lng)
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+# $geoNear pipeline for the k nearest hospitals on the 2dsphere index on hospital_user.geo
+def nearest_hospitals_pipeline(lat, lng, limit, max_km=None):
+    geo_near = {
+        'near': {'type': 'Point', 'coordinates': [lng, lat]},
+        'key': 'geo',
+        'distanceField': 'distance_m',
+        'spherical': True
+    }
+    if max_km is not None:
+        geo_near['maxDistance'] = max_km * 1000
+    
+    return [
+        {'$geoNear': geo_near},
+        {'$limit': limit},
+        {'$project': projection(HOSPITAL_SCHEMA, 'distance_m')}
+    ]
+
+def geo_near_results(hospitals):
+    return [(hospital, hospital.pop('distance_m') / 1000) for hospital in hospitals]
+
+HOSPITAL_LOCATION_FIELDS = projection(HOSPITAL_SCHEMA, 'geo', 'lat', 'lng', 'latitude', 'longitude')
+
+# The 2dsphere index is sparse, so $geoNear never sees hospitals without a geo
+# point; those are fetched separately and merged in. The filter cannot use an
+# index, but backfill-hospital-geo leaves it matching (almost) nothing.
+UNLOCATED_HOSPITALS = {'geo': {'$exists': False}}
+
+# The k nearest of a batch of hospitals by haversine distance, merged with
+# already-ranked (hospital, km) pairs. Without a radius, hospitals with no
+# coordinates at all fill any remaining places with an unknown (None) distance.
+def rank_hospitals(hospitals, lat, lng, limit, max_km=None, ranked=()):
+    candidates = list(ranked)
+    unknown = []
+    for hospital in hospitals:
+        coordinates = hospital_coordinates(hospital)
+        if coordinates is None:
+            unknown.append(hospital)
+            continue
+        distance_km = haversine_km(lat, lng, *coordinates)
+        if max_km is None or distance_km <= max_km:
+            candidates.append((hospital, distance_km))
+    nearest = heapq.nsmallest(limit, candidates, key=lambda candidate: candidate[1])
+    if max_km is None:
+        nearest += [(hospital, None) for hospital in unknown[:limit - len(nearest)]]
+    return nearest
+
+def nearest_hospitals_geo(lat, lng, limit, max_km=None):
+    return geo_near_results(mongo.db.hospital_user.aggregate(nearest_hospitals_pipeline(lat, lng, limit, max_km)))
+
+# Fallback for deployments without the 2dsphere index: haversine scan over all hospitals
+def nearest_hospitals_scan(lat, lng, limit, max_km=None):
+    return rank_hospitals(mongo.db.hospital_user.find({}, HOSPITAL_LOCATION_FIELDS), lat, lng, limit, max_km)
+
+def nearest_hospitals(lat, lng, limit, max_km=None):
+    try:
+        located = nearest_hospitals_geo(lat, lng, limit, max_km)
+    except OperationFailure:
+        return nearest_hospitals_scan(lat, lng, limit, max_km)
+    unlocated = mongo.db.hospital_user.find(UNLOCATED_HOSPITALS, HOSPITAL_LOCATION_FIELDS)
+    return rank_hospitals(unlocated, lat, lng, limit, max_km, ranked=located)
+
+# Incidents without a position get hospitals in storage order, distance unknown
+def unranked_hospitals(hospitals):
+    return [(hospital, None) for hospital in hospitals]
+
+@app.cli.command('backfill-hospital-geo')
+def backfill_hospital_geo():
+    """Store hospital lat/lng as GeoJSON points and build the 2dsphere index."""
+    updated = 0
+    for hospital in mongo.db.hospital_user.find({'geo': {'$exists': False}}):
+        coordinates = hospital_coordinates(hospital)
+        if coordinates is None:
+            continue
+        lat, lng = coordinates
+        mongo.db.hospital_user.update_one(
+            {'_id': hospital['_id']},
+            {'$set': {'geo': {'type': 'Point', 'coordinates': [lng, lat]}}}
+        )
+        updated += 1
+    
+    mongo.db.hospital_user.create_index([('geo', '2dsphere')])
+    print(f"Backfilled {updated} hospitals; 2dsphere index on hospital_user.geo is ready")
+
+@app.cli.command('migrate-ambulances')
+def migrate_ambulances_command():
+    """Move legacy assigned_incident_id values to current_incident_id and locate ambulances."""
+    moved, located = migrate_ambulances(mongo.db)
+    ensure_indexes(mongo.db)
+    bump_collection_version(mongo.db, 'ambulances')
+    print(f"Moved {moved} legacy assignments; gave {located} ambulances their hospital's position")
+
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+# seed-data writes (and with --drop, wipes) whatever it is pointed at, so it takes
+# an explicit --uri rather than the app's MONGO_URI, and refuses remote databases
+# unless their name marks them as scratch data
+def seed_target(uri):
+    parsed = parse_uri(uri)
+    database = parsed.get('database')
+    if not database:
+        raise click.BadParameter('must name a database', param_hint='--uri')
+    remote = [host for host, _ in parsed['nodelist'] if host not in LOCAL_HOSTS]
+    if remote and not database.endswith(('_bench', '_seed')):
+        raise click.BadParameter(
+            f"{', '.join(remote)} is not local; seed remote databases only if their name ends in _bench or _seed",
+            param_hint='--uri'
+        )
+    return MongoClient(uri).get_database(database)
+
+@app.cli.command('seed-data')
+@click.option('--uri', required=True, help='Database to seed, e.g. mongodb://localhost:27017/SwiftAid_bench.')
+@click.option('--scale', default=10000, show_default=True, help='Number of incidents; other collections scale with it.')
+@click.option('--batch-size', default=5000, show_default=True, help='Documents per insert_many call.')
+@click.option('--days', default=90, show_default=True, help='Spread incidents over this many days.')
+@click.option('--seed', 'seed_value', default=0, show_default=True, help='Random seed, for reproducible data.')
+@click.option('--drop', is_flag=True, help='Drop the seeded collections first.')
+def seed_data_command(uri, scale, batch_size, days, seed_value, drop):
+    """Generate synthetic users, incidents, hospitals, ambulances and assignments."""
+    db = seed_target(uri)
+    if drop:
+        click.confirm(f"Drop {', '.join(SEED_COLLECTIONS)} in {db.name}?", abort=True)
+
+    def progress(collection, inserted):
+        print(f"\r{collection:<22}{inserted:>12,}", end='', flush=True)
+
+    started = time.perf_counter()
+    counts = seed(db, scale, batch_size=batch_size, days=days, seed_value=seed_value,
+                  drop=drop, progress=progress)
+    print(f"\rSeeded {sum(counts.values()):,} documents in {time.perf_counter() - started:.1f}s")
+    for collection, count in counts.items():
+        print(f"  {collection:<22}{count:>12,}")
+
+    ensure_indexes(db)
+    if app.config['STATS_ROLLUPS']:
+        StatsRollups(db).rebuild()
+    bump_collection_version(db, *SEED_COLLECTIONS)
+
 # INCIDENT TRACKING ROUTES - FIXED VERSION
+INCIDENT_LOCATION_FIELDS = projection(['incident_id', 'user_email', 'user_name', 'timestamp', 'lat', 'lng'])
+
+def incident_location(incident):
+    if incident.get('lat') is None or incident.get('lng') is None:
+        return None
+    return float(incident['lat']), float(incident['lng'])
+
+# Hospitals named by an incident's assignments, fetched with a single $in query
+def assigned_hospitals_filter(assignments):
+    names = {assignment.get('hospital_name') for assignment in assignments if assignment.get('hospital_name')}
+    return {'hospital_name': {'$in': list(names)}} if names else None
+
+def incident_hospitals_response(incident, hospitals, assignments, ambulances, assigned_hospitals):
+    # Ambulances dispatched to this incident, keyed by their hospital
+    ambulance_assignments = {}
+    for ambulance in ambulances:
+        ambulance_assignments.setdefault(ambulance.get('hospital_name'), ambulance)
+    
+    hospitals_by_name = {}
+    for hospital in assigned_hospitals:
+        hospitals_by_name.setdefault(hospital.get('hospital_name'), hospital)
+    
+    result = {
+        'incident': {
+            '_id': str(incident['_id']),
+            'incident_id': incident.get('incident_id'),
+            'user_email': incident.get('user_email'),
+            'user_name': incident.get('user_name'),
+            'timestamp': incident.get('timestamp')
+        },
+        'nearby_hospitals': [],
+        'accepted_hospitals': [],
+        'ambulance_assignments': ambulance_assignments
+    }
+    
+    for hospital, distance_km in hospitals:
+        hospital_data = serialize(hospital, HOSPITAL_SCHEMA)
+        if distance_km is None:
+            hospital_data['distance'] = 'Unknown'
+            hospital_data['distance_km'] = None
+        else:
+            hospital_data['distance'] = f'{distance_km:.1f} km'
+            hospital_data['distance_km'] = round(distance_km, 3)
+        result['nearby_hospitals'].append(hospital_data)
+    
+    for assignment in assignments:
+        hospital = hospitals_by_name.get(assignment.get('hospital_name'))
+        if hospital:
+            hospital_data = serialize(hospital, HOSPITAL_SCHEMA)
+            hospital_data['accepted_at'] = assignment.get('accepted_at')
+            hospital_data['status'] = assignment.get('status', 'pending')
+            result['accepted_hospitals'].append(hospital_data)
+    
+    return result
+
 @app.route('/admin/incident-hospitals/<incident_id>', methods=['GET'])
 @token_required
 def get_incident_hospitals(current_user, incident_id):
     try:
-        incident = mongo.db.incidents.find_one({'_id': ObjectId(incident_id)})
+        incident = mongo.db.incidents.find_one({'_id': ObjectId(incident_id)}, INCIDENT_LOCATION_FIELDS)
         if not incident:
             return jsonify({'success': False, 'error': 'Incident not found'}), 404
 
-        hospitals = list(mongo.db.hospital_user.find())
+        try:
+            limit = parse_limit(request.args.get('limit'), default=10)
+            max_km = parse_max_km(request.args.get('max_km'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        location = incident_location(incident)
+        if location:
+            hospitals = nearest_hospitals(*location, limit, max_km)
+        else:
+            hospitals = unranked_hospitals(mongo.db.hospital_user.find({}, projection(HOSPITAL_SCHEMA)).limit(limit))
         
-        incident_assignments = []
-        if 'incident_assignments' in mongo.db.list_collection_names():
-            incident_assignments = list(mongo.db.incident_assignments.find({
-                'incident_id': str(incident_id)
-            }))
+        # A missing collection simply yields no documents
+        incident_assignments = list(mongo.db.incident_assignments.find({'incident_id': str(incident_id)}))
+        ambulances = mongo.db.ambulances.find({'current_incident_id': str(incident_id)})
         
-        ambulance_assignments = {}
-        for assignment in incident_assignments:
-            ambulance = mongo.db.ambulances.find_one({
-                'hospital_name': assignment['hospital_name'],
-                'status': 'on-duty'
-            })
-            if ambulance:
-                ambulance_assignments[assignment['hospital_name']] = ambulance
-
-        result = {
-            'incident': {
-                '_id': str(incident['_id']),
-                'incident_id': incident.get('incident_id'),
-                'user_email': incident.get('user_email'),
-                'user_name': incident.get('user_name'),
-                'timestamp': incident.get('timestamp')
-            },
-            'nearby_hospitals': [],
-            'accepted_hospitals': [],
-            'ambulance_assignments': ambulance_assignments
-        }
-
-        for hospital in hospitals:
-            hospital_data = {
-                '_id': str(hospital['_id']),
-                'hospital_name': hospital.get('hospital_name'),
-                'email': hospital.get('email'),
-                'phone': hospital.get('phone'),
-                'location': hospital.get('location'),
-                'distance': '5 km'
-            }
-            result['nearby_hospitals'].append(hospital_data)
-
-        for assignment in incident_assignments:
-            hospital = mongo.db.hospital_user.find_one({
-                'hospital_name': assignment['hospital_name']
-            })
-            if hospital:
-                hospital_data = {
-                    '_id': str(hospital['_id']),
-                    'hospital_name': hospital.get('hospital_name'),
-                    'email': hospital.get('email'),
-                    'phone': hospital.get('phone'),
-                    'location': hospital.get('location'),
-                    'accepted_at': assignment.get('accepted_at'),
-                    'status': assignment.get('status', 'pending')
-                }
-                result['accepted_hospitals'].append(hospital_data)
+        assigned_hospitals = []
+        hospitals_query = assigned_hospitals_filter(incident_assignments)
+        if hospitals_query:
+            assigned_hospitals = mongo.db.hospital_user.find(hospitals_query, projection(HOSPITAL_SCHEMA))
+        
+        return jsonify(incident_hospitals_response(
+            incident, hospitals, incident_assignments, ambulances, assigned_hospitals
+        ))
 
-        return jsonify(result)
+    except Exception as e:
+        logger.exception("Error in get_incident_hospitals: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/dashboard/incidents/<incident_id>/dispatch', methods=['POST'])
+@token_required
+def dispatch_ambulance(current_user, incident_id):
+    try:
+        incident = mongo.db.incidents.find_one({'_id': ObjectId(incident_id)}, {'lat': 1, 'lng': 1})
+        if not incident:
+            return jsonify({'success': False, 'error': 'Incident not found'}), 404
+        if incident.get('lat') is None or incident.get('lng') is None:
+            return jsonify({'success': False, 'error': 'Incident has no location'}), 400
+        
+        data = request.get_json(silent=True) or {}
+        max_km = float(data['max_km']) if data.get('max_km') is not None else None
+        lat, lng = float(incident['lat']), float(incident['lng'])
+        
+        def nearest_hospital_names():
+            return [hospital['hospital_name'] for hospital, _ in nearest_hospitals(lat, lng, 10, max_km)]
+        
+        ambulance = claim_nearest_ambulance(
+            mongo.db, incident_id, lat, lng, max_km=max_km,
+            nearest_hospital_names=nearest_hospital_names,
+            projection=projection(AMBULANCE_DETAIL_SCHEMA, 'geo')
+        )
+        if not ambulance:
+            return jsonify({'success': False, 'error': 'No available ambulance'}), 404
+        
+        bump_collection_version(mongo.db, 'ambulances')
+        ambulance_data = serialize(ambulance, AMBULANCE_DETAIL_SCHEMA)
+        if ambulance.get('geo'):
+            ambulance_lng, ambulance_lat = ambulance['geo']['coordinates'][:2]
+            ambulance_data['distance_km'] = round(haversine_km(lat, lng, ambulance_lat, ambulance_lng), 3)
+        
+        return jsonify({'success': True, 'ambulance': ambulance_data})
+        
     except Exception as e:
-        print(f"Error in get_incident_hospitals: {str(e)}")
+        logger.exception("Error in dispatch_ambulance: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/incident-assignments', methods=['GET'])
 @token_required
 def get_all_incident_assignments(current_user):
     try:
-        # Get all incidents
-        incidents = list(mongo.db.incidents.find().sort('timestamp', -1))
+        try:
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        try:
+            match = keyset_filter(request.args.get('after'))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
         
-        processed_incidents = []
+        # One page of incidents joined with their hospital and ambulance assignments
+        pipeline = [
+            {'$match': match},
+            {'$sort': {'timestamp': -1, '_id': -1}},
+            {'$limit': limit + 1},
+            {
+                '$project': {
+                    'incident_id': 1,
+                    'user_name': 1,
+                    'user_email': 1,
+                    'timestamp': 1,
+                    'incident_key': {'$toString': '$_id'}
+                }
+            },
+            {
+                '$lookup': {
+                    'from': 'incident_assignments',
+                    'localField': 'incident_key',
+                    'foreignField': 'incident_id',
+                    'as': 'hospital_assignments'
+                }
+            },
+            {
+                '$lookup': {
+                    'from': 'ambulances',
+                    'localField': 'incident_key',
+                    'foreignField': 'current_incident_id',
+                    'as': 'ambulance_assignments'
+                }
+            },
+            {
+                '$set': {
+                    'total_hospitals_notified': {'$size': '$hospital_assignments'},
+                    'hospitals_accepted': {
+                        '$size': {
+                            '$filter': {
+                                'input': '$hospital_assignments',
+                                'cond': {'$eq': ['$$this.status', 'accepted']}
+                            }
+                        }
+                    },
+                    'ambulances_assigned': {'$size': '$ambulance_assignments'}
+                }
+            }
+        ]
+        incidents, next_cursor = split_page(list(mongo.db.incidents.aggregate(pipeline)), limit)
         
+        processed_incidents = []
         for incident in incidents:
-            incident_id = str(incident['_id'])
-            
-            # Get hospital assignments for this incident
-            hospital_assignments = []
-            if 'incident_assignments' in mongo.db.list_collection_names():
-                hospital_assignments = list(mongo.db.incident_assignments.find({
-                    'incident_id': incident_id
-                }))
-            
-            # Get ambulance assignments for this incident
-            ambulance_assignments = []
-            if 'ambulances' in mongo.db.list_collection_names():
-                ambulance_assignments = list(mongo.db.ambulances.find({
-                    'assigned_incident_id': incident_id
-                }))
-            
-            # Count statistics - FIXED LOGIC
-            total_notified = len(hospital_assignments)
-            total_accepted = len([a for a in hospital_assignments if a.get('status') == 'accepted'])
-            ambulances_assigned = len(ambulance_assignments)
-            
             incident_data = {
-                '_id': incident_id,
+                '_id': incident['incident_key'],
                 'incident_id': incident.get('incident_id'),
                 'user_name': incident.get('user_name'),
                 'user_email': incident.get('user_email'),
                 'timestamp': incident.get('timestamp'),
-                'hospital_assignments': hospital_assignments,
-                'ambulance_assignments': ambulance_assignments,
-                'total_hospitals_notified': total_notified,
-                'hospitals_accepted': total_accepted,
-                'ambulances_assigned': ambulances_assigned
+                'hospital_assignments': incident['hospital_assignments'],
+                'ambulance_assignments': incident['ambulance_assignments'],
+                'total_hospitals_notified': incident['total_hospitals_notified'],
+                'hospitals_accepted': incident['hospitals_accepted'],
+                'ambulances_assigned': incident['ambulances_assigned']
             }
             processed_incidents.append(incident_data)
         
-        return jsonify(processed_incidents)
+        response = jsonify(processed_incidents)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
         
     except Exception as e:
-        print(f"Error in get_all_incident_assignments: {str(e)}")
+        logger.exception("Error in get_all_incident_assignments: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# BULK ASSIGNMENT CREATION
+ASSIGNMENT_STATUSES = ('notified', 'accepted')
+
+def parse_assignment_item(item):
+    if not isinstance(item, dict):
+        raise ValueError('Assignment must be an object')
+    incident_id = item.get('incident_id')
+    if not incident_id or not ObjectId.is_valid(incident_id):
+        raise ValueError('incident_id must be a valid id')
+    hospital_id = item.get('hospital_id')
+    hospital_name = item.get('hospital_name')
+    if hospital_id and not ObjectId.is_valid(hospital_id):
+        raise ValueError('hospital_id must be a valid id')
+    if not hospital_id and not hospital_name:
+        raise ValueError('hospital_id or hospital_name is required')
+    status = item.get('status', 'notified')
+    if status not in ASSIGNMENT_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(ASSIGNMENT_STATUSES)}")
+    return {'incident_id': str(incident_id), 'hospital_id': hospital_id, 'hospital_name': hospital_name, 'status': status}
+
+# Create many incident -> hospital assignments in a fixed number of round trips:
+# one $in each for incidents and hospitals, one bulk insert, one bulk ambulance
+# claim and one read-back of the claimed ambulances. Returns a result per item, in request order. When ordered,
+# processing stops at the first failing item and the rest are reported as skipped.
+def create_assignments(items, ordered=True):
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = parse_assignment_item(item)
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+    
+    existing_incidents = set()
+    hospitals_by_id, hospitals_by_name = {}, {}
+    if parsed:
+        incident_ids = list({ObjectId(item['incident_id']) for item in parsed.values()})
+        existing_incidents = {
+            str(incident['_id']) for incident in mongo.db.incidents.find({'_id': {'$in': incident_ids}}, {'_id': 1})
+        }
+        
+        hospital_ids = [ObjectId(item['hospital_id']) for item in parsed.values() if item['hospital_id']]
+        hospital_names = [item['hospital_name'] for item in parsed.values() if not item['hospital_id']]
+        for hospital in mongo.db.hospital_user.find(
+            {'$or': [{'_id': {'$in': hospital_ids}}, {'hospital_name': {'$in': hospital_names}}]},
+            {'hospital_name': 1}
+        ):
+            hospitals_by_id[str(hospital['_id'])] = hospital
+            hospitals_by_name.setdefault(hospital.get('hospital_name'), hospital)
+    
+    for index, item in list(parsed.items()):
+        if item['hospital_id']:
+            hospital = hospitals_by_id.get(item['hospital_id'])
+        else:
+            hospital = hospitals_by_name.get(item['hospital_name'])
+        error = None
+        if item['incident_id'] not in existing_incidents:
+            error = 'Incident not found'
+        elif hospital is None:
+            error = 'Hospital not found'
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+            del parsed[index]
+        else:
+            item['hospital'] = hospital
+    
+    parsed = items_to_insert(results, parsed, ordered)
+    
+    now = datetime.utcnow()
+    indexes, documents = [], []
+    for index, item in sorted(parsed.items()):
+        indexes.append(index)
+        documents.append({
+            'incident_id': item['incident_id'],
+            'hospital_id': str(item['hospital']['_id']),
+            'hospital_name': item['hospital']['hospital_name'],
+            'status': item['status'],
+            'assigned_at': now,
+            'accepted_at': now if item['status'] == 'accepted' else None
+        })
+    
+    write_errors = {}
+    if documents:
+        try:
+            mongo.db.incident_assignments.bulk_write([InsertOne(document) for document in documents], ordered=ordered)
+        except BulkWriteError as e:
+            write_errors = {error['index']: error['errmsg'] for error in e.details['writeErrors']}
+    
+    created = record_inserts(results, indexes, documents, write_errors, ordered)
+    claims = [result for result, document in created if document['status'] == 'accepted']
+    
+    # Each accepting hospital dispatches one of its available ambulances; every
+    # update claims atomically, so concurrent requests never share an ambulance
+    claimed = 0
+    if claims:
+        claimed = mongo.db.ambulances.bulk_write([
+            UpdateOne(
+                {**AVAILABLE_AMBULANCE, 'hospital_name': result['hospital_name']},
+                {'$set': {'current_incident_id': result['incident_id'], 'assignment_time': now}}
+            )
+            for result in claims
+        ], ordered=False).modified_count
+    
+    if claimed:
+        dispatched = {}
+        for ambulance in mongo.db.ambulances.find(
+            {'current_incident_id': {'$in': [result['incident_id'] for result in claims]}, 'assignment_time': now},
+            {'current_incident_id': 1, 'hospital_name': 1}
+        ):
+            dispatched.setdefault((ambulance['current_incident_id'], ambulance['hospital_name']), []).append(ambulance['_id'])
+        for result in claims:
+            ambulance_ids = dispatched.get((result['incident_id'], result['hospital_name']))
+            if ambulance_ids:
+                result['ambulance_id'] = str(ambulance_ids.pop())
+    
+    fill_skipped(results)
+    
+    if created:
+        bump_collection_version(mongo.db, 'incident_assignments', *(['ambulances'] if claimed else []))
+    return results
+
+@app.route('/admin/incident-assignments/bulk', methods=['POST'])
+@token_required
+def bulk_create_assignments(current_user):
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('assignments')
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'error': 'assignments must be a non-empty list'}), 400
+        if len(items) > app.config['BULK_ASSIGNMENT_LIMIT']:
+            return jsonify({
+                'success': False,
+                'error': f"At most {app.config['BULK_ASSIGNMENT_LIMIT']} assignments per request"
+            }), 400
+        
+        try:
+            ordered = parse_ordered(data.get('ordered', True))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        results = create_assignments(items, ordered=ordered)
+        created = sum(1 for result in results if result['status'] == 'created')
+        
+        return jsonify({
+            'success': created == len(results),
+            'created': created,
+            'failed': sum(1 for result in results if result['status'] == 'error'),
+            'skipped': sum(1 for result in results if result['status'] == 'skipped'),
+            'results': results
+        })
+        
+    except Exception as e:
+        logger.exception("Error in bulk_create_assignments: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # CREATE TEST ASSIGNMENTS ENDPOINT
@@ -683,45 +1884,24 @@ def get_all_incident_assignments(current_user):
 def create_test_assignments(current_user):
     try:
         # Get recent incidents
-        incidents = list(mongo.db.incidents.find().sort('timestamp', -1).limit(5))
+        incidents = list(mongo.db.incidents.find({}, {'_id': 1}).sort('timestamp', -1).limit(5))
         
-        # Get hospitals
-        hospitals = list(mongo.db.hospital_user.find())
+        # First 2 hospitals
+        hospitals = list(mongo.db.hospital_user.find({}, {'_id': 1}).limit(2))
         
-        assignments_created = 0
+        # Assign 2 hospitals to each incident: the first accepts, the second is notified
+        items = [
+            {
+                'incident_id': str(incident['_id']),
+                'hospital_id': str(hospital['_id']),
+                'status': 'accepted' if i == 0 else 'notified'
+            }
+            for incident in incidents
+            for i, hospital in enumerate(hospitals)
+        ]
         
-        for incident in incidents:
-            incident_id = str(incident['_id'])
-            
-            # Assign 2 hospitals to each incident (like in your screenshot)
-            for i, hospital in enumerate(hospitals[:2]):  # First 2 hospitals
-                assignment = {
-                    'incident_id': incident_id,
-                    'hospital_id': str(hospital['_id']),
-                    'hospital_name': hospital['hospital_name'],
-                    'status': 'accepted' if i == 0 else 'notified',  # First hospital accepted, second notified
-                    'assigned_at': datetime.utcnow(),
-                    'accepted_at': datetime.utcnow() if i == 0 else None
-                }
-                
-                # Insert into incident_assignments collection
-                mongo.db.incident_assignments.insert_one(assignment)
-                assignments_created += 1
-                
-                # Also assign ambulance if hospital accepted
-                if i == 0:  # For the accepted hospital
-                    ambulance = mongo.db.ambulances.find_one({
-                        'hospital_name': hospital['hospital_name']
-                    })
-                    if ambulance:
-                        # Update ambulance assignment
-                        mongo.db.ambulances.update_one(
-                            {'_id': ambulance['_id']},
-                            {'$set': {
-                                'assigned_incident_id': incident_id,
-                                'assignment_time': datetime.utcnow()
-                            }}
-                        )
+        results = create_assignments(items, ordered=False) if items else []
+        assignments_created = sum(1 for result in results if result['status'] == 'created')
         
         return jsonify({
             'success': True, 
@@ -730,107 +1910,187 @@ def create_test_assignments(current_user):
         })
         
     except Exception as e:
-        print(f"Error creating test assignments: {str(e)}")
+        logger.exception("Error creating test assignments: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Incident counters for the stats page, each computed as one branch of a single $facet
+INCIDENT_STAT_FACETS = {
+    'total_incidents': {},
+    'manual_self': {'metadata.manual': True, 'metadata.sos_type': 'self'},
+    'manual_other': {'metadata.manual': True, 'metadata.sos_type': 'other'},
+    'auto_detected': {'metadata.manual': False}
+}
+
+def live_incident_counts(today_start):
+    facets = {
+        name: ([{'$match': match}] if match else []) + [{'$count': 'count'}]
+        for name, match in INCIDENT_STAT_FACETS.items()
+    }
+    facets['today_incidents'] = [
+        {'$match': {'timestamp': {'$gte': today_start}}},
+        {'$count': 'count'}
+    ]
+    
+    facet_result = next(mongo.db.incidents.aggregate([{'$facet': facets}]), {})
+    incident_counts = {
+        name: (facet_result.get(name) or [{'count': 0}])[0]['count']
+        for name in facets
+    }
+    incident_counts['active_assignments'] = mongo.db.incident_assignments.count_documents({
+        'status': 'accepted'
+    })
+    return incident_counts
+
+def rollup_incident_counts(totals, today_start):
+    return {
+        'total_incidents': totals.get('total', 0),
+        'today_incidents': stats_rollups.day_count(today_start),
+        'manual_self': totals.get('manual_self', 0),
+        'manual_other': totals.get('manual_other', 0),
+        'auto_detected': totals.get('auto_detected', 0),
+        'active_assignments': totals.get('accepted_assignments', 0)
+    }
+
+def compute_dashboard_stats():
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    totals = rollup_totals()
+    if totals:
+        incident_counts = rollup_incident_counts(totals, today_start)
+    else:
+        incident_counts = live_incident_counts(today_start)
+    
+    total_incidents = incident_counts['total_incidents']
+    total_contacts = mongo.db.contacts.estimated_document_count()
+    
+    return {
+        'total_users': mongo.db.users.estimated_document_count(),
+        'total_incidents': total_incidents,
+        'today_incidents': incident_counts['today_incidents'],
+        'total_hospitals': mongo.db.hospital_user.estimated_document_count(),
+        'total_police': mongo.db.POLICE_users.estimated_document_count(),
+        'active_assignments': incident_counts['active_assignments'],
+        'emails_sent': total_incidents * total_contacts,
+        'incident_types': {
+            'manual_self': incident_counts['manual_self'],
+            'manual_other': incident_counts['manual_other'],
+            'auto_detected': incident_counts['auto_detected']
+        }
+    }
+
 @app.route('/dashboard/stats', methods=['GET'])
 @token_required
 def get_dashboard_stats(current_user):
     try:
-        total_users = mongo.db.users.count_documents({})
-        total_incidents = mongo.db.incidents.count_documents({})
-        
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_incidents = mongo.db.incidents.count_documents({
-            'timestamp': {'$gte': today_start}
-        })
-        
-        total_hospitals = mongo.db.hospital_user.count_documents({})
-        total_police = mongo.db.POLICE_users.count_documents({})
-        
-        active_assignments = 0
-        if 'incident_assignments' in mongo.db.list_collection_names():
-            active_assignments = mongo.db.incident_assignments.count_documents({
-                'status': 'accepted'
-            })
-        
-        total_contacts = mongo.db.contacts.count_documents({})
-        emails_sent = total_incidents * total_contacts
-        
-        manual_self_incidents = mongo.db.incidents.count_documents({
-            'metadata.manual': True,
-            'metadata.sos_type': 'self'
-        })
-        
-        manual_other_incidents = mongo.db.incidents.count_documents({
-            'metadata.manual': True,
-            'metadata.sos_type': 'other'
-        })
-        
-        auto_incidents = mongo.db.incidents.count_documents({
-            'metadata.manual': False
-        })
-        
-        stats = {
-            'total_users': total_users,
-            'total_incidents': total_incidents,
-            'today_incidents': today_incidents,
-            'total_hospitals': total_hospitals,
-            'total_police': total_police,
-            'active_assignments': active_assignments,
-            'emails_sent': emails_sent,
-            'incident_types': {
-                'manual_self': manual_self_incidents,
-                'manual_other': manual_other_incidents,
-                'auto_detected': auto_incidents
-            }
-        }
+        stats = stats_cache.get_or_compute('dashboard_stats', compute_dashboard_stats)
         
         return jsonify(stats)
         
     except Exception as e:
-        print(f"Error in get_dashboard_stats: {str(e)}")
+        logger.exception("Error in get_dashboard_stats: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+TREND_GRANULARITIES = {
+    'hour': (timedelta(hours=1), '%Y-%m-%dT%H:00'),
+    'day': (timedelta(days=1), '%Y-%m-%d'),
+    'week': (timedelta(weeks=1), '%Y-%m-%d')
+}
+
+# Start of the hour/day/ISO week (Monday) containing value
+def truncate_to_bucket(value, granularity):
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'hour':
+        return value
+    value = value.replace(hour=0)
+    if granularity == 'week':
+        value -= timedelta(days=value.weekday())
+    return value
+
 @app.route('/dashboard/analytics/trends', methods=['GET'])
 @token_required
 def get_incident_trends(current_user):
     try:
-        days = int(request.args.get('days', 30))
+        try:
+            days = parse_bounded_int(request.args.get('days'), 'days', 30, app.config['MAX_TREND_DAYS'])
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        granularity = request.args.get('granularity', 'day')
+        tz_name = request.args.get('tz', 'UTC')
+        
+        if granularity not in TREND_GRANULARITIES:
+            return jsonify({'success': False, 'error': 'granularity must be one of hour, day, week'}), 400
+        try:
+            tz = ZoneInfo(tz_name)
+        except (ZoneInfoNotFoundError, ValueError):
+            return jsonify({'success': False, 'error': f'Unknown timezone: {tz_name}'}), 400
+        
+        step, label_format = TREND_GRANULARITIES[granularity]
+        end_date = datetime.now(tz)
+        start_date = truncate_to_bucket(end_date - timedelta(days=days), granularity)
         
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
+        date_trunc = {'date': '$timestamp', 'unit': granularity, 'timezone': tz_name}
+        if granularity == 'week':
+            date_trunc['startOfWeek'] = 'monday'
         
-        date_range = []
+        # Bucket every incident in the window in one pass instead of one count per bucket
+        pipeline = [
+            {
+                '$match': {
+                    'timestamp': {
+                        '$gte': start_date.astimezone(timezone.utc).replace(tzinfo=None),
+                        '$lte': end_date.astimezone(timezone.utc).replace(tzinfo=None)
+                    }
+                }
+            },
+            {
+                '$group': {
+                    '_id': {'$dateTrunc': date_trunc},
+                    'count': {'$sum': 1}
+                }
+            }
+        ]
+        
+        bucket_counts = {}
+        if granularity in ('hour', 'day') and tz_name == 'UTC' and rollup_totals():
+            # UTC hour/day buckets are materialized in stats_rollups
+            rollup_counts = stats_rollups.bucket_counts(
+                granularity,
+                start_date.replace(tzinfo=None),
+                end_date.replace(tzinfo=None)
+            )
+            for bucket_start, count in rollup_counts.items():
+                bucket_counts[bucket_start.strftime(label_format)] = count
+        else:
+            for bucket in mongo.db.incidents.aggregate(pipeline):
+                bucket_start = bucket['_id'].replace(tzinfo=timezone.utc).astimezone(tz)
+                bucket_counts[bucket_start.strftime(label_format)] = bucket['count']
+        
+        # Zero-fill buckets with no incidents
+        counts = []
         current_date = start_date
         while current_date <= end_date:
-            date_range.append(current_date.date())
-            current_date += timedelta(days=1)
-        
-        daily_counts = []
-        for single_date in date_range:
-            next_date = single_date + timedelta(days=1)
-            day_count = mongo.db.incidents.count_documents({
-                'timestamp': {
-                    '$gte': datetime.combine(single_date, datetime.min.time()),
-                    '$lt': datetime.combine(next_date, datetime.min.time())
-                }
-            })
-            daily_counts.append({
-                'date': single_date.strftime('%Y-%m-%d'),
-                'count': day_count
+            label = current_date.strftime(label_format)
+            counts.append({
+                'date': label,
+                'count': bucket_counts.get(label, 0)
             })
+            current_date += step
         
-        return jsonify(daily_counts)
+        return jsonify(counts)
         
     except Exception as e:
-        print(f"Error in get_incident_trends: {str(e)}")
+        logger.exception("Error in get_incident_trends: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/dashboard/analytics/hourly', methods=['GET'])
 @token_required
 def get_hourly_distribution(current_user):
     try:
+        totals = rollup_totals()
+        if totals:
+            by_hour = totals.get('by_hour', {})
+            return jsonify([by_hour.get(f'{hour:02d}', 0) for hour in range(24)])
+        
         pipeline = [
             {
                 '$group': {
@@ -854,11 +2114,12 @@ def get_hourly_distribution(current_user):
         return jsonify(hourly_distribution)
         
     except Exception as e:
-        print(f"Error in get_hourly_distribution: {str(e)}")
+        logger.exception("Error in get_hourly_distribution: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/contacts', methods=['GET'])
 @token_required
+@conditional_get('contacts')
 def get_emergency_contacts(current_user):
     try:
         contacts_cursor = mongo.db.contacts.find()
@@ -869,10 +2130,15 @@ def get_emergency_contacts(current_user):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+KNOWN_COLLECTIONS = (
+    'users', 'profiles', 'contacts', 'incidents', 'incident_assignments',
+    'ambulances', 'hospital_user', 'POLICE_users'
+)
+
 @app.route('/debug/hospitals', methods=['GET'])
 def debug_hospitals():
     try:
-        collections = mongo.db.list_collection_names()
+        collections = sorted(mongo.db.list_collection_names())
         
         hospitals_data = {}
         for collection_name in ['hospitals', 'hospital', 'Hospitals', 'Hospital']:
@@ -888,11 +2154,88 @@ def debug_hospitals():
         
         return jsonify({
             'all_collections': collections,
+            'known_collections': {name: name in collections for name in KNOWN_COLLECTIONS},
             'hospitals_data': hospitals_data
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# LIVE DASHBOARD FEED
+live_feed = LiveFeed(
+    mongo.db,
+    ['incidents', 'ambulances'],
+    serializers={
+        'incidents': lambda incident: serialize_incident(incident, resolve_user_names([incident])),
+        'ambulances': lambda ambulance: serialize(ambulance, AMBULANCE_SCHEMA, id_field='ambulance_id')
+    },
+    poll_interval=app.config['LIVE_FEED_POLL_INTERVAL'],
+    max_subscribers=app.config['LIVE_FEED_MAX_SUBSCRIBERS']
+)
+thread_streams = threading.BoundedSemaphore(app.config['LIVE_FEED_THREAD_STREAMS'])
+
+def sse_event(event):
+    return f"event: {event['collection']}\ndata: {app.json.dumps(event)}\n\n"
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+# EventSource cannot send headers, and a JWT in the query string would be
+# written to every access log, so the stream is opened with a short-lived
+# single-use ticket instead. Only the ticket's hash is stored (TTL-expired).
+def stream_ticket_filter(ticket):
+    return {'_id': TokenCache.key(ticket), 'expires_at': {'$gt': datetime.utcnow()}}
+
+@app.route('/dashboard/stream-ticket', methods=['POST'])
+@token_required
+def create_stream_ticket(current_user):
+    try:
+        ticket = secrets.token_urlsafe(32)
+        mongo.db.stream_tickets.insert_one({
+            '_id': TokenCache.key(ticket),
+            'username': current_user,
+            'expires_at': datetime.utcnow() + timedelta(seconds=app.config['STREAM_TICKET_TTL'])
+        })
+        return jsonify({'success': True, 'ticket': ticket, 'expires_in': app.config['STREAM_TICKET_TTL']})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Server-Sent Events stream of incident and ambulance changes, opened with
+# ?ticket= from POST /dashboard/stream-ticket. asgi.py serves this route
+# without tying up a thread per client; this version is for the dev server and
+# plain WSGI deployments, and only allows LIVE_FEED_THREAD_STREAMS at a time.
+@app.route('/dashboard/stream', methods=['GET'])
+def stream_dashboard():
+    ticket = request.args.get('ticket')
+    if not ticket or not mongo.db.stream_tickets.find_one_and_delete(stream_ticket_filter(ticket)):
+        return jsonify({'success': False, 'error': 'Stream ticket is missing, expired or already used'}), 401
+    
+    if not thread_streams.acquire(blocking=False):
+        return jsonify({'success': False, 'error': 'Too many live feed subscribers'}), 503
+    try:
+        subscriber = live_feed.subscribe()
+    except LiveFeedFull as e:
+        thread_streams.release()
+        return jsonify({'success': False, 'error': str(e)}), 503
+    
+    def generate():
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = subscriber.get(timeout=15)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            yield sse_event(event)
+    
+    # Runs when the server closes the response, even if the body never started
+    def close():
+        live_feed.unsubscribe(subscriber)
+        thread_streams.release()
+    
+    response = Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+    response.call_on_close(close)
+    return response
+
 @app.route('/health', methods=['GET'])
 def health_check():
     try:
@@ -901,7 +2244,7 @@ def health_check():
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'timestamp': datetime.utcnow(),
             'service': 'SwiftAid Backend API'
         })
     except Exception as e:
@@ -909,72 +2252,51 @@ def health_check():
             'status': 'unhealthy',
             'database': 'disconnected',
             'error': str(e),
-            'timestamp': datetime.utcnow().isoformat() + 'Z'
+            'timestamp': datetime.utcnow()
         }), 500
 
 # POLICE STATIONS ROUTES - UPDATED FOR POLICE_USERS COLLECTION
 @app.route('/admin/police-stations', methods=['GET'])
 @token_required
+@conditional_get('POLICE_users')
 def get_police_stations(current_user):
     try:
-        print("Fetching police officers from POLICE_users collection...")
+        logger.debug("Fetching police officers from POLICE_users collection")
         
         # Get all police officers
-        police_cursor = mongo.db.POLICE_users.find()
+        police_cursor = mongo.db.POLICE_users.find({}, projection(POLICE_OFFICER_SCHEMA))
         police_data = list(police_cursor)
         
-        print(f"Found {len(police_data)} police officers")
+        logger.debug("Found %d police officers", len(police_data))
         
         processed_police = []
         for officer in police_data:
-            officer_data = {
-                '_id': str(officer.get('_id')),
-                'username': officer.get('username'),
-                'email': officer.get('email'),
-                'full_name': officer.get('full_name'),
-                'police_station': officer.get('police_station'),
-                'designation': officer.get('designation'),
-                'role': officer.get('role'),
-                'status': officer.get('status', 'active'),
-                'created_at': officer.get('created_at'),
-                'last_login': officer.get('last_login')
-            }
+            officer_data = serialize(officer, POLICE_OFFICER_SCHEMA)
             processed_police.append(officer_data)
         
         return jsonify(processed_police)
         
     except Exception as e:
-        print(f"Error in get_police_stations: {str(e)}")
+        logger.exception("Error in get_police_stations: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/police-stations/<officer_id>', methods=['GET'])
 @token_required
 def get_police_station_details(current_user, officer_id):
     try:
-        print(f"Fetching police officer details for ID: {officer_id}")
+        logger.debug("Fetching police officer details for ID: %s", officer_id)
         
-        officer = mongo.db.POLICE_users.find_one({'_id': ObjectId(officer_id)})
+        officer = mongo.db.POLICE_users.find_one({'_id': ObjectId(officer_id)}, projection(POLICE_OFFICER_SCHEMA))
         
         if not officer:
             return jsonify({'success': False, 'error': 'Police officer not found'}), 404
         
-        officer_data = {
-            '_id': str(officer.get('_id')),
-            'username': officer.get('username'),
-            'email': officer.get('email'),
-            'full_name': officer.get('full_name'),
-            'police_station': officer.get('police_station'),
-            'designation': officer.get('designation'),
-            'role': officer.get('role'),
-            'status': officer.get('status', 'active'),
-            'created_at': officer.get('created_at'),
-            'last_login': officer.get('last_login')
-        }
+        officer_data = serialize(officer, POLICE_OFFICER_SCHEMA)
         
         return jsonify(officer_data)
         
     except Exception as e:
-        print(f"Error in get_police_station_details: {str(e)}")
+        logger.exception("Error in get_police_station_details: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/police-stations/<officer_id>', methods=['DELETE'])
@@ -984,6 +2306,7 @@ def delete_police_station(current_user, officer_id):
         result = mongo.db.POLICE_users.delete_one({'_id': ObjectId(officer_id)})
         
         if result.deleted_count == 1:
+            bump_collection_version(mongo.db, 'POLICE_users')
             return jsonify({'success': True, 'message': 'Police officer deleted successfully'})
         else:
             return jsonify({'success': False, 'error': 'Police officer not found'}), 404
@@ -993,7 +2316,7 @@ def delete_police_station(current_user, officer_id):
 
 @app.route('/test', methods=['GET'])
 def test_endpoint():
-    return jsonify({'message': 'Backend is working!', 'timestamp': datetime.utcnow().isoformat() + 'Z'})
+    return jsonify({'message': 'Backend is working!', 'timestamp': datetime.utcnow()})
 
 # Error handlers
 @app.errorhandler(404)
@@ -1008,5 +2331,14 @@ def internal_error(error):
 def unauthorized(error):
     return jsonify({'success': False, 'error': 'Unauthorized access'}), 401
 
+# Open the first pooled connection before serving traffic;
+# the driver then grows the pool to minPoolSize in the background
+def warm_up():
+    try:
+        mongo.db.command('ping')
+    except Exception as e:
+        logger.exception("Warm-up failed: %s", e)
+
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
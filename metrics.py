@@ -0,0 +1,226 @@
+# In-process request and MongoDB instrumentation, rendered in the Prometheus
+# text exposition format.
+# Every Mongo command issued while a request is active in the current context
+# is attributed to that request's endpoint. The current request lives in a
+# contextvar, so this covers Flask's worker threads and the async handlers in
+# asgi.py alike (Motor runs each command in a copy of the caller's context).
+# Commands from background threads (rollups, live feed, index bootstrap) are
+# grouped under '(background)'.
+#
+# Counters are per process. Each process publishes a snapshot() of them, and
+# render() sums any number of snapshots, so one scrape can cover every worker
+# (main.py keeps the snapshots in the metrics_snapshots collection).
+import threading
+import time
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+BACKGROUND = '(background)'
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        return {'counts': list(self.counts), 'count': self.count, 'sum': self.sum}
+
+    def merge(self, data):
+        self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+        self.count += data['count']
+        self.sum += data['sum']
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.commands_per_request = Histogram(COMMAND_BUCKETS)
+        self.commands = 0
+        self.db_seconds = 0.0
+        self.documents = 0
+        self.over_budget = 0
+
+    # Mongo-safe plain data: endpoint names and request keys become values, not keys
+    def to_dict(self, endpoint):
+        return {
+            'endpoint': endpoint,
+            'requests': [[method, status, count] for (method, status), count in self.requests.items()],
+            'latency': self.latency.to_dict(),
+            'commands_per_request': self.commands_per_request.to_dict(),
+            'commands': self.commands,
+            'db_seconds': self.db_seconds,
+            'documents': self.documents,
+            'over_budget': self.over_budget
+        }
+
+    def merge(self, data):
+        for method, status, count in data['requests']:
+            self.requests[(method, status)] = self.requests.get((method, status), 0) + count
+        self.latency.merge(data['latency'])
+        self.commands_per_request.merge(data['commands_per_request'])
+        self.commands += data['commands']
+        self.db_seconds += data['db_seconds']
+        self.documents += data['documents']
+        self.over_budget += data['over_budget']
+
+class RequestStats:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.commands = 0
+        self.db_seconds = 0.0
+        self.documents = 0
+
+# Documents carried by a command reply: cursor batches, or the write count
+def reply_documents(reply):
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch') or cursor.get('nextBatch') or ())
+    if 'value' in reply:
+        return 1 if reply['value'] else 0
+    if 'n' in reply and isinstance(reply['n'], int):
+        return reply['n']
+    return 0
+
+class Metrics(monitoring.CommandListener):
+    def __init__(self, command_budget=20, on_over_budget=None):
+        self.command_budget = command_budget
+        self.on_over_budget = on_over_budget
+        self.endpoints = {}
+        self._current = ContextVar('metrics_request', default=None)
+        self._lock = threading.Lock()
+
+    def _endpoint(self, name):
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints.setdefault(name, EndpointStats())
+        return stats
+
+    # Request lifecycle
+    def start_request(self, endpoint):
+        self._current.set(RequestStats(endpoint or 'unmatched'))
+
+    def finish_request(self, method, status_code):
+        current = self._current.get()
+        if current is None:
+            return None
+        self._current.set(None)
+        elapsed = time.perf_counter() - current.started
+
+        with self._lock:
+            stats = self._endpoint(current.endpoint)
+            key = (method, str(status_code))
+            stats.requests[key] = stats.requests.get(key, 0) + 1
+            stats.latency.observe(elapsed)
+            stats.commands_per_request.observe(current.commands)
+            stats.commands += current.commands
+            stats.db_seconds += current.db_seconds
+            stats.documents += current.documents
+            if self.command_budget and current.commands > self.command_budget:
+                stats.over_budget += 1
+
+        if self.command_budget and current.commands > self.command_budget and self.on_over_budget:
+            self.on_over_budget(current)
+        return current
+
+    # CommandListener
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.duration_micros, reply_documents(event.reply))
+
+    def failed(self, event):
+        self._record(event.duration_micros, 0)
+
+    def _record(self, duration_micros, documents):
+        current = self._current.get()
+        with self._lock:
+            # Async handlers run a request's commands concurrently on Motor's threads
+            if current is not None:
+                current.commands += 1
+                current.db_seconds += duration_micros / 1e6
+                current.documents += documents
+                return
+            stats = self._endpoint(BACKGROUND)
+            stats.commands += 1
+            stats.db_seconds += duration_micros / 1e6
+            stats.documents += documents
+
+    def snapshot(self):
+        with self._lock:
+            return [stats.to_dict(endpoint) for endpoint, stats in self.endpoints.items()]
+
+    # Prometheus text format, over this process's counters or the sum of snapshots
+    def render(self, snapshots=None):
+        if snapshots is None:
+            with self._lock:
+                endpoints = sorted(self.endpoints.items())
+        else:
+            merged = {}
+            for snapshot in snapshots:
+                for data in snapshot:
+                    merged.setdefault(data['endpoint'], EndpointStats()).merge(data)
+            endpoints = sorted(merged.items())
+        return self._render(endpoints)
+
+    def _render(self, endpoints):
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, endpoint, hist):
+            for bound, count in zip(hist.buckets, hist.counts):
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {hist.count}')
+            lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {hist.sum:.6f}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {hist.count}')
+
+        metric('swiftaid_http_requests_total', 'counter', 'HTTP requests by endpoint, method and status.')
+        for endpoint, stats in endpoints:
+            for (method, status), count in sorted(stats.requests.items()):
+                lines.append(f'swiftaid_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+        metric('swiftaid_http_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+        for endpoint, stats in endpoints:
+            if stats.latency.count:
+                histogram('swiftaid_http_request_duration_seconds', endpoint, stats.latency)
+
+        metric('swiftaid_mongo_commands_per_request', 'histogram', 'MongoDB commands issued per request.')
+        for endpoint, stats in endpoints:
+            if stats.commands_per_request.count:
+                histogram('swiftaid_mongo_commands_per_request', endpoint, stats.commands_per_request)
+
+        metric('swiftaid_mongo_commands_total', 'counter', 'MongoDB commands issued.')
+        for endpoint, stats in endpoints:
+            lines.append(f'swiftaid_mongo_commands_total{{endpoint="{endpoint}"}} {stats.commands}')
+
+        metric('swiftaid_mongo_duration_seconds_total', 'counter', 'Time spent in MongoDB commands.')
+        for endpoint, stats in endpoints:
+            lines.append(f'swiftaid_mongo_duration_seconds_total{{endpoint="{endpoint}"}} {stats.db_seconds:.6f}')
+
+        metric('swiftaid_mongo_documents_returned_total', 'counter', 'Documents returned or written by MongoDB commands.')
+        for endpoint, stats in endpoints:
+            lines.append(f'swiftaid_mongo_documents_returned_total{{endpoint="{endpoint}"}} {stats.documents}')
+
+        metric('swiftaid_mongo_command_budget_exceeded_total', 'counter',
+               f'Requests that issued more than {self.command_budget} MongoDB commands.')
+        for endpoint, stats in endpoints:
+            if endpoint != BACKGROUND:
+                lines.append(f'swiftaid_mongo_command_budget_exceeded_total{{endpoint="{endpoint}"}} {stats.over_budget}')
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,237 @@
+# Incrementally maintained incident statistics in the stats_rollups collection:
+#   {_id: 'hour:YYYY-MM-DDTHH', kind: 'hour', start, count}   per UTC hour
+#   {_id: 'day:YYYY-MM-DD', kind: 'day', start, count}        per UTC day
+#   {_id: 'totals', total, manual_self, manual_other, auto_detected,
+#    by_hour: {'00'..'23': count}, accepted_assignments}
+#   {_id: 'meta', high_water: <last incident _id folded in>, built_at}
+# A background maintainer folds new incidents in by scanning past the _id
+# high-water mark, so dashboard reads become a handful of document fetches.
+#
+# Every process runs a maintainer, but every change to the rollups (catching
+# up, rebuilding, and deleting incidents together with their discount) happens
+# under one cross-process lock (see locks.py), so there is a single writer at
+# a time and a rebuild can never swap in underneath an increment.
+import logging
+import threading
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from locks import MongoLock, LockTimeout
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS = 'stats_rollups'
+HOUR_FORMAT = '%Y-%m-%dT%H'
+TYPE_FIELDS = ('manual_self', 'manual_other', 'auto_detected')
+
+# Same predicates as the dashboard's incident type counters
+TYPE_CONDITIONS = {
+    'manual_self': {'$and': [{'$eq': ['$metadata.manual', True]}, {'$eq': ['$metadata.sos_type', 'self']}]},
+    'manual_other': {'$and': [{'$eq': ['$metadata.manual', True]}, {'$eq': ['$metadata.sos_type', 'other']}]},
+    'auto_detected': {'$eq': ['$metadata.manual', False]}
+}
+
+class StatsRollups:
+    def __init__(self, db, interval=5.0, lock_seconds=30, lock_timeout=30):
+        self.db = db
+        self.interval = interval
+        self.lock = MongoLock(db, ROLLUPS, lease_seconds=lock_seconds)
+        self.lock_timeout = lock_timeout
+        self._thread = None
+
+    @property
+    def collection(self):
+        return self.db[ROLLUPS]
+
+    # Per-hour counts and type totals for the incidents matching query
+    def summarize(self, query):
+        group = {
+            '_id': {'$dateToString': {'format': HOUR_FORMAT, 'date': '$timestamp'}},
+            'count': {'$sum': 1}
+        }
+        for field, condition in TYPE_CONDITIONS.items():
+            group[field] = {'$sum': {'$cond': [condition, 1, 0]}}
+
+        summary = {'hours': {}, 'totals': dict.fromkeys(('total',) + TYPE_FIELDS, 0)}
+        for bucket in self.db.incidents.aggregate([{'$match': query}, {'$group': group}]):
+            if bucket['_id']:
+                summary['hours'][bucket['_id']] = bucket['count']
+            summary['totals']['total'] += bucket['count']
+            for field in TYPE_FIELDS:
+                summary['totals'][field] += bucket[field]
+        return summary
+
+    def _operations(self, summary, sign=1):
+        days = {}
+        by_hour = {}
+        operations = []
+        for hour_key, count in summary['hours'].items():
+            start = datetime.strptime(hour_key, HOUR_FORMAT)
+            day_key = hour_key[:10]
+            days[day_key] = days.get(day_key, 0) + count
+            by_hour[hour_key[11:]] = by_hour.get(hour_key[11:], 0) + count
+            operations.append(UpdateOne(
+                {'_id': f'hour:{hour_key}'},
+                {'$inc': {'count': sign * count}, '$setOnInsert': {'kind': 'hour', 'start': start}},
+                upsert=True
+            ))
+        for day_key, count in days.items():
+            operations.append(UpdateOne(
+                {'_id': f'day:{day_key}'},
+                {'$inc': {'count': sign * count},
+                 '$setOnInsert': {'kind': 'day', 'start': datetime.strptime(day_key, '%Y-%m-%d')}},
+                upsert=True
+            ))
+
+        increments = {field: sign * value for field, value in summary['totals'].items()}
+        increments.update({f'by_hour.{hour}': sign * count for hour, count in by_hour.items()})
+        operations.append(UpdateOne({'_id': 'totals'}, {'$inc': increments}, upsert=True))
+        return operations
+
+    def apply(self, summary, sign=1, collection=None):
+        if not summary['totals']['total']:
+            return
+        (collection or self.collection).bulk_write(self._operations(summary, sign), ordered=False)
+
+    def _high_water_query(self, high_water, latest_id):
+        query = {'_id': {'$lte': latest_id}}
+        if high_water:
+            query['_id']['$gt'] = high_water
+        return query
+
+    def meta(self):
+        return self.collection.find_one({'_id': 'meta'})
+
+    def is_built(self):
+        return self.meta() is not None
+
+    # Fold in incidents inserted past the high-water mark; returns how many
+    def catch_up(self):
+        with self.lock.hold(self.lock_timeout):
+            return self._catch_up()
+
+    def _catch_up(self):
+        meta = self.meta()
+        if meta is None:
+            return 0
+        high_water = meta.get('high_water')
+        latest = self.db.incidents.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        if not latest or (high_water and latest['_id'] <= high_water):
+            return 0
+
+        # The mark moves in the same ordered batch, after the increments: a
+        # failed write leaves it where it was and the range is retried whole
+        summary = self.summarize(self._high_water_query(high_water, latest['_id']))
+        operations = self._operations(summary) if summary['totals']['total'] else []
+        operations.append(UpdateOne({'_id': 'meta', 'high_water': high_water},
+                                    {'$set': {'high_water': latest['_id']}}))
+        self.collection.bulk_write(operations, ordered=True)
+        return summary['totals']['total']
+
+    def refresh_assignments(self):
+        accepted = self.db.incident_assignments.count_documents({'status': 'accepted'})
+        self.collection.update_one({'_id': 'totals'}, {'$set': {'accepted_assignments': accepted}}, upsert=True)
+
+    # Delete incidents and subtract those already folded in, as one locked step so
+    # the maintainer cannot fold in an incident between its count and its delete.
+    # The discount is taken from what this call deletes, so retrying a failed
+    # batch never subtracts the same incidents twice.
+    def delete_incidents(self, query):
+        with self.lock.hold(self.lock_timeout):
+            meta = self.meta()
+            summary = None
+            if meta is not None and meta.get('high_water'):
+                summary = self.summarize({'$and': [query, {'_id': {'$lte': meta['high_water']}}]})
+            result = self.db.incidents.delete_many(query)
+            if summary is not None:
+                self.apply(summary, sign=-1)
+            return result
+
+    # Regenerate every rollup from scratch into a scratch collection, then swap it in
+    def rebuild(self):
+        with self.lock.hold():
+            return self._rebuild()
+
+    def _rebuild(self):
+        latest = self.db.incidents.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        high_water = latest['_id'] if latest else None
+        summary = self.summarize({'_id': {'$lte': high_water}} if high_water else {})
+
+        scratch = self.db[f'{ROLLUPS}_rebuild_{ObjectId()}']
+        scratch.insert_one({'_id': 'totals', **dict.fromkeys(('total',) + TYPE_FIELDS, 0), 'by_hour': {}})
+        self.apply(summary, collection=scratch)
+        scratch.insert_one({'_id': 'meta', 'high_water': high_water, 'built_at': datetime.utcnow()})
+        scratch.create_index([('kind', 1), ('start', 1)])
+        scratch.rename(ROLLUPS, dropTarget=True)
+
+        self.refresh_assignments()
+        return summary['totals']['total']
+
+    # Compare the stored rollups with live counts over the same _id range; returns mismatches
+    def verify(self):
+        meta = self.meta()
+        if meta is None:
+            return ['rollups have not been built']
+        high_water = meta.get('high_water')
+        live = self.summarize({'_id': {'$lte': high_water}} if high_water else {})
+
+        mismatches = []
+        totals = self.totals() or {}
+        for field, value in live['totals'].items():
+            if totals.get(field, 0) != value:
+                mismatches.append(f'{field}: rollup {totals.get(field, 0)} != live {value}')
+
+        stored_hours = {
+            doc['_id'][5:]: doc['count']
+            for doc in self.collection.find({'kind': 'hour'}, {'count': 1}) if doc['count']
+        }
+        for hour_key in sorted(set(stored_hours) | set(live['hours'])):
+            stored, actual = stored_hours.get(hour_key, 0), live['hours'].get(hour_key, 0)
+            if stored != actual:
+                mismatches.append(f'hour {hour_key}: rollup {stored} != live {actual}')
+        return mismatches
+
+    # Read API
+    def totals(self):
+        return self.collection.find_one({'_id': 'totals'})
+
+    def bucket_counts(self, kind, start, end):
+        cursor = self.collection.find(
+            {'kind': kind, 'start': {'$gte': start, '$lte': end}},
+            {'start': 1, 'count': 1}
+        )
+        return {doc['start']: doc['count'] for doc in cursor}
+
+    def day_count(self, day):
+        doc = self.collection.find_one({'_id': f"day:{day.strftime('%Y-%m-%d')}"}, {'count': 1})
+        return doc['count'] if doc else 0
+
+    # Background maintainer
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='stats-rollups', daemon=True)
+            self._thread.start()
+
+    # One maintenance pass, skipped when another process holds the lock; on a
+    # fresh deployment only the first worker in builds the rollups
+    def maintain(self):
+        try:
+            with self.lock.hold(timeout=0):
+                if not self.is_built():
+                    self._rebuild()
+                else:
+                    self._catch_up()
+                    self.refresh_assignments()
+        except LockTimeout:
+            pass
+
+    def _run(self):
+        while True:
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.exception("Stats rollup maintenance failed: %s", e)
+            time.sleep(self.interval)
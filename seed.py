@@ -0,0 +1,235 @@
+# Synthetic data at production scale for profiling and load tests.
+# Everything is derived from the incident count, e.g. for scale=100000:
+#   10000 users (each with a profile and 2 contacts), 100 hospitals,
+#   300 ambulances, 50 police users, 100000 incidents and assignments
+#   for a fifth of them.
+# Documents are generated lazily and written in insert_many batches, so
+# memory stays flat even at 10M incidents. Output is deterministic for a
+# given scale and seed.
+import random
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+COLLECTIONS = (
+    'users', 'profiles', 'contacts', 'incidents', 'hospital_user',
+    'ambulances', 'POLICE_users', 'incident_assignments'
+)
+
+FIRST_NAMES = ('Aarav', 'Diya', 'Ishaan', 'Ananya', 'Kabir', 'Meera', 'Rohan', 'Saanvi',
+               'Vihaan', 'Priya', 'Arjun', 'Kavya', 'Nikhil', 'Riya', 'Siddharth', 'Tara')
+LAST_NAMES = ('Sharma', 'Iyer', 'Reddy', 'Nair', 'Gowda', 'Patel', 'Rao', 'Menon',
+              'Kulkarni', 'Shetty', 'Das', 'Hegde', 'Pillai', 'Joshi', 'Bhat', 'Kumar')
+CITIES = (('Bengaluru', 12.9716, 77.5946), ('Mysuru', 12.2958, 76.6394),
+          ('Mangaluru', 12.9141, 74.8560), ('Hubballi', 15.3647, 75.1240),
+          ('Belagavi', 15.8497, 74.4977), ('Kalaburagi', 17.3297, 76.8343))
+RELATIONSHIPS = ('Parent', 'Spouse', 'Sibling', 'Friend', 'Colleague')
+BLOOD_GROUPS = ('A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-')
+DESIGNATIONS = ('Constable', 'Head Constable', 'Sub-Inspector', 'Inspector')
+
+def user_count(scale):
+    return max(10, scale // 10)
+
+def hospital_count(scale):
+    return max(20, scale // 1000)
+
+def police_count(scale):
+    return max(20, scale // 2000)
+
+def user_name(i):
+    return f'{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}'
+
+def user_email(i):
+    return f'user{i}@seed.swiftaid.test'
+
+def hospital_name(i):
+    return f'{CITIES[i % len(CITIES)][0]} General Hospital {i}'
+
+def phone(rng):
+    return f'+91{rng.randint(6000000000, 9999999999)}'
+
+def near(rng, city, spread_km=15):
+    _, lat, lng = city
+    spread = spread_km / 111
+    return round(lat + rng.uniform(-spread, spread), 6), round(lng + rng.uniform(-spread, spread), 6)
+
+def generate_users(rng, scale, now):
+    for i in range(user_count(scale)):
+        yield {
+            'name': user_name(i),
+            'email': user_email(i),
+            'username': f'user{i}',
+            'created_at': now - timedelta(days=rng.randint(30, 720))
+        }
+
+def generate_profiles(rng, scale, now):
+    for i in range(user_count(scale)):
+        yield {
+            'user_email': user_email(i),
+            'blood_group': rng.choice(BLOOD_GROUPS),
+            'age': rng.randint(18, 80),
+            'phone': phone(rng),
+            'city': CITIES[i % len(CITIES)][0]
+        }
+
+def generate_contacts(rng, scale, now):
+    for i in range(user_count(scale)):
+        for priority in (1, 2):
+            contact = rng.randrange(user_count(scale))
+            yield {
+                'user_email': user_email(i),
+                'name': user_name(contact),
+                'email': user_email(contact),
+                'phone': phone(rng),
+                'relationship': rng.choice(RELATIONSHIPS),
+                'priority': priority
+            }
+
+def generate_hospitals(rng, scale, now):
+    for i in range(hospital_count(scale)):
+        city = CITIES[i % len(CITIES)]
+        lat, lng = near(rng, city)
+        yield {
+            'hospital_name': hospital_name(i),
+            'email': f'hospital{i}@seed.swiftaid.test',
+            'phone': phone(rng),
+            'location': city[0],
+            'lat': lat,
+            'lng': lng,
+            'geo': {'type': 'Point', 'coordinates': [lng, lat]}
+        }
+
+# Ambulances are positioned around their hospital's city
+def generate_ambulances(rng, scale, now):
+    for i in range(hospital_count(scale) * 3):
+        lat, lng = near(rng, CITIES[(i // 3) % len(CITIES)])
+        yield {
+            'vehicle_number': f'KA-{i % 50 + 1:02d}-AM-{i:04d}',
+            'driver_name': user_name(i + 7),
+            'phone': phone(rng),
+            'status': 'on-duty' if rng.random() < 0.7 else 'off-duty',
+            'hospital_name': hospital_name(i // 3),
+            'current_incident_id': None,
+            'geo': {'type': 'Point', 'coordinates': [lng, lat]}
+        }
+
+def generate_police(rng, scale, now):
+    for i in range(police_count(scale)):
+        city = CITIES[i % len(CITIES)][0]
+        yield {
+            'username': f'officer{i}',
+            'email': f'officer{i}@seed.swiftaid.test',
+            'full_name': user_name(i + 3),
+            'police_station': f'{city} Station {i // len(CITIES) + 1}',
+            'designation': rng.choice(DESIGNATIONS),
+            'role': 'police',
+            'status': 'active' if rng.random() < 0.9 else 'inactive',
+            'created_at': now - timedelta(days=rng.randint(30, 720)),
+            'last_login': now - timedelta(hours=rng.randint(1, 500))
+        }
+
+# Incidents are spread over the last `days` days, oldest first, so _id and timestamp agree
+def generate_incidents(rng, scale, now, days=90):
+    users = user_count(scale)
+    start = now - timedelta(days=days)
+    step = timedelta(days=days) / max(scale, 1)
+    for i in range(scale):
+        user = rng.randrange(users)
+        lat, lng = near(rng, CITIES[user % len(CITIES)], spread_km=25)
+        kind = rng.random()
+        metadata = {'manual': kind < 0.6}
+        if metadata['manual']:
+            metadata['sos_type'] = 'self' if kind < 0.4 else 'other'
+        incident = {
+            'incident_id': f'INC-{i:08d}',
+            'user_email': user_email(user),
+            'lat': lat,
+            'lng': lng,
+            'accel_mag': round(rng.uniform(0.5, 60), 2),
+            'speed': round(rng.uniform(0, 120), 1),
+            'metadata': metadata,
+            'timestamp': start + step * i,
+            'emails_sent': rng.randint(0, 3)
+        }
+        # Only some incidents carry user_name, as in production
+        if rng.random() < 0.5:
+            incident['user_name'] = user_name(user)
+        yield incident
+
+def insert_batches(collection, documents, batch_size, progress=None):
+    batch = []
+    inserted = 0
+    for document in documents:
+        batch.append(document)
+        if len(batch) == batch_size:
+            inserted += len(collection.insert_many(batch, ordered=False).inserted_ids)
+            batch = []
+            if progress:
+                progress(collection.name, inserted)
+    if batch:
+        inserted += len(collection.insert_many(batch, ordered=False).inserted_ids)
+    if progress:
+        progress(collection.name, inserted)
+    return inserted
+
+# Two hospitals notified for a fifth of the incidents; the first accepts and, where its
+# hospital has an on-duty ambulance, that ambulance is dispatched to the incident
+def seed_assignments(db, rng, scale, now, batch_size, progress=None):
+    ambulances = {}
+    for ambulance in db.ambulances.find({'status': 'on-duty'}, {'hospital_name': 1}):
+        ambulances.setdefault(ambulance['hospital_name'], ambulance['_id'])
+    hospitals = list(db.hospital_user.find({}, {'hospital_name': 1}))
+
+    dispatched = {}
+    def assignments():
+        incidents = db.incidents.find({}, {'_id': 1, 'timestamp': 1}).sort('_id', 1).batch_size(batch_size)
+        for incident in incidents:
+            if rng.random() >= 0.2:
+                continue
+            incident_id = str(incident['_id'])
+            assigned_at = incident['timestamp'] + timedelta(minutes=rng.randint(1, 5))
+            for i, hospital in enumerate(rng.sample(hospitals, 2)):
+                yield {
+                    'incident_id': incident_id,
+                    'hospital_id': str(hospital['_id']),
+                    'hospital_name': hospital['hospital_name'],
+                    'status': 'accepted' if i == 0 else 'notified',
+                    'assigned_at': assigned_at,
+                    'accepted_at': assigned_at + timedelta(minutes=2) if i == 0 else None
+                }
+                if i == 0 and hospital['hospital_name'] in ambulances:
+                    dispatched[ambulances[hospital['hospital_name']]] = (incident_id, assigned_at)
+
+    inserted = insert_batches(db.incident_assignments, assignments(), batch_size, progress)
+
+    # Each ambulance ends up on the latest incident it was dispatched to
+    operations = [
+        UpdateOne({'_id': ambulance_id},
+                  {'$set': {'current_incident_id': incident_id, 'assignment_time': assigned_at}})
+        for ambulance_id, (incident_id, assigned_at) in dispatched.items()
+    ]
+    for i in range(0, len(operations), batch_size):
+        db.ambulances.bulk_write(operations[i:i + batch_size], ordered=False)
+    return inserted
+
+def seed(db, scale, batch_size=5000, days=90, seed_value=0, drop=False, progress=None):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    if drop:
+        for name in COLLECTIONS:
+            db.drop_collection(name)
+
+    counts = {}
+    generators = (
+        ('users', generate_users), ('profiles', generate_profiles), ('contacts', generate_contacts),
+        ('hospital_user', generate_hospitals), ('ambulances', generate_ambulances),
+        ('POLICE_users', generate_police)
+    )
+    for name, generate in generators:
+        counts[name] = insert_batches(db[name], generate(rng, scale, now), batch_size, progress)
+    counts['incidents'] = insert_batches(
+        db.incidents, generate_incidents(rng, scale, now, days), batch_size, progress
+    )
+    counts['incident_assignments'] = seed_assignments(db, rng, scale, now, batch_size, progress)
+    return counts
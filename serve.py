@@ -0,0 +1,68 @@
+# Production launcher: runs main.py's Flask app under gunicorn with a
+# configurable worker/thread model. The Flask dev server (python main.py)
+# stays available for local work.
+#
+#   python serve.py
+#
+# Settings come from the environment / .env:
+#   HOST, PORT                 bind address (0.0.0.0:5000)
+#   WEB_WORKERS                worker processes (2 * CPUs + 1)
+#   WEB_THREADS                threads per worker (4)
+#   WEB_TIMEOUT                worker timeout in seconds (60)
+#   MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_WAIT_QUEUE_TIMEOUT_MS
+#                              PyMongo pool, per worker (see main.py); defaults
+#                              to WEB_THREADS + 7 background threads, min 2.
+#                              The deployment opens roughly WEB_WORKERS times
+#                              that, plus monitoring connections, so check it
+#                              against the server's connection limit.
+#   METRICS_TOKEN              bearer token for /metrics; workers' counters are
+#                              summed, so any worker can answer a scrape
+#
+# Each /dashboard/stream (SSE) client holds a gthread thread here, so a worker
+# allows only LIVE_FEED_THREAD_STREAMS of them. Deployments with many open
+# dashboards should run asgi.py instead, which serves the stream on its event
+# loop (up to LIVE_FEED_MAX_SUBSCRIBERS per process).
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+from gunicorn.app.base import BaseApplication
+
+load_dotenv()
+
+def post_fork(server, worker):
+    # Each worker imports the app (and opens its own MongoClient) after the fork,
+    # then warms the pool before accepting requests
+    from main import warm_up
+    warm_up()
+
+class SwiftAidApplication(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import app
+        return app
+
+def gunicorn_options():
+    threads = int(os.getenv('WEB_THREADS', 4))
+    return {
+        'bind': f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}",
+        'workers': int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1)),
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'timeout': int(os.getenv('WEB_TIMEOUT', 60)),
+        'keepalive': 5,
+        # PyMongo clients are not fork-safe, so the app must load inside each worker
+        'preload_app': False,
+        'post_fork': post_fork,
+        'accesslog': '-',
+    }
+
+if __name__ == '__main__':
+    SwiftAidApplication(gunicorn_options()).run()
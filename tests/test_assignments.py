@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from assignments import parse_ordered, items_to_insert, record_inserts, fill_skipped
+
+def document(index):
+    return {'_id': f'id{index}', 'incident_id': f'incident{index}', 'hospital_name': f'Hospital {index}'}
+
+# Items 0..4, of which item 1 failed validation; the rest are inserted in one batch
+def run(ordered, write_errors):
+    results = [None, {'index': 1, 'status': 'error', 'error': 'Incident not found'}, None, None, None]
+    parsed = {0: {}, 2: {}, 3: {}, 4: {}}
+    indexes = sorted(items_to_insert(results, parsed, ordered))
+    documents = [document(index) for index in indexes]
+    created = record_inserts(results, indexes, documents, write_errors, ordered)
+    return fill_skipped(results), created
+
+def statuses(results):
+    return [result['status'] for result in results]
+
+@pytest.mark.parametrize('value', [True, False])
+def test_parse_ordered_accepts_booleans(value):
+    assert parse_ordered(value) is value
+
+@pytest.mark.parametrize('value', ['false', 0, 1, None, [], {}])
+def test_parse_ordered_rejects_non_booleans(value):
+    with pytest.raises(ValueError):
+        parse_ordered(value)
+
+def test_ordered_stops_at_first_validation_error():
+    results, created = run(ordered=True, write_errors={})
+    assert statuses(results) == ['created', 'error', 'skipped', 'skipped', 'skipped']
+    assert [result['index'] for result, _ in created] == [0]
+
+def test_unordered_inserts_around_validation_error():
+    results, created = run(ordered=False, write_errors={})
+    assert statuses(results) == ['created', 'error', 'created', 'created', 'created']
+    assert [result['assignment_id'] for result in results if result['status'] == 'created'] == \
+        ['id0', 'id2', 'id3', 'id4']
+
+def test_unordered_write_error_maps_batch_position_to_request_index():
+    # Batch positions 0..3 are request indexes 0, 2, 3, 4; position 2 is index 3
+    results, _ = run(ordered=False, write_errors={2: 'duplicate key'})
+    assert statuses(results) == ['created', 'error', 'created', 'error', 'created']
+    assert results[3]['error'] == 'duplicate key'
+
+def test_ordered_write_error_skips_the_rest_of_the_batch():
+    results = [None] * 4
+    indexes = [0, 1, 2, 3]
+    documents = [document(index) for index in indexes]
+    created = record_inserts(results, indexes, documents, {1: 'duplicate key'}, ordered=True)
+    fill_skipped(results)
+    assert statuses(results) == ['created', 'error', 'skipped', 'skipped']
+    assert results[1] == {'index': 1, 'status': 'error', 'error': 'duplicate key'}
+    assert [result['index'] for result, _ in created] == [0]
+
+def test_results_are_in_request_order():
+    results, _ = run(ordered=False, write_errors={0: 'duplicate key'})
+    assert [result['index'] for result in results] == [0, 1, 2, 3, 4]